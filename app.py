@@ -2,14 +2,41 @@
 """Pied Piper AI Agent Team Dashboard — Backend"""
 
 import json
+import re
 import glob
+import gzip
+import hashlib
+import base64
+import binascii
 import os
+import queue
+import time
+import collections
 import secrets
+import sqlite3
+import bisect
 import functools
-from datetime import datetime, timezone
-from flask import Flask, jsonify, render_template, request, redirect, url_for, session, abort, send_from_directory
+import heapq
+import math
+import itertools
+import mmap
+import fcntl
+import struct
+import sys
+import threading
+import concurrent.futures
+import contextlib
+from datetime import datetime, timedelta, timezone
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for, session, abort, send_from_directory
 from werkzeug.utils import secure_filename
 
+import transcripts
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", secrets.token_hex(32))
 
@@ -32,35 +59,60 @@ def login_required(f):
     return decorated
 
 
-def parse_sessions(agent_name):
-    """Parse all JSONL session files for an agent."""
-    sessions_dir = os.path.join(AGENTS_DIR, agent_name, "sessions")
-    messages = []
-    if not os.path.isdir(sessions_dir):
-        return messages
-    for fp in glob.glob(os.path.join(sessions_dir, "*.jsonl")):
-        with open(fp, "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    rec = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                if rec.get("type") == "message":
-                    msg = rec.get("message", {})
-                    messages.append({
-                        "id": rec.get("id"),
-                        "timestamp": rec.get("timestamp"),
-                        "role": msg.get("role"),
-                        "model": msg.get("model"),
-                        "provider": msg.get("provider"),
-                        "usage": msg.get("usage"),
-                        "stopReason": msg.get("stopReason"),
-                        "content_preview": _content_preview(msg.get("content")),
-                    })
-    return messages
+class _Message:
+    """One transcript message of a feed, holding just what as_dict() returns.
+
+    Role, model, provider and stop reason are interned; the JSON dict is only
+    built for rows that are actually returned.
+    """
+
+    __slots__ = ("id", "timestamp", "role", "model", "provider", "stop_reason", "usage", "preview")
+
+    def __init__(self, rec):
+        msg = rec.get("message", {})
+        self.id = rec.get("id")
+        self.timestamp = rec.get("timestamp")
+        self.role = _intern(msg.get("role"))
+        self.model = _intern(msg.get("model"))
+        self.provider = _intern(msg.get("provider"))
+        self.stop_reason = _intern(msg.get("stopReason"))
+        self.usage = msg.get("usage")  # echoed back verbatim
+        self.preview = _content_preview(msg.get("content"))
+
+    def feed_key(self):
+        return (self.timestamp or "", self.id or "")
+
+    def as_dict(self, agent=None):
+        d = {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "role": self.role,
+            "model": self.model,
+            "provider": self.provider,
+            "usage": self.usage,
+            "stopReason": self.stop_reason,
+            "content_preview": self.preview,
+        }
+        if agent is not None:
+            d["agent"] = agent
+        return d
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _usage_numbers(usage):
+    """(input, output, cache read, cache write, total tokens, cost) of a usage mapping."""
+    usage = usage or {}
+    return (
+        usage.get("input", 0) or 0,
+        usage.get("output", 0) or 0,
+        usage.get("cacheRead", 0) or 0,
+        usage.get("cacheWrite", 0) or 0,
+        usage.get("totalTokens", 0) or 0,
+        (usage.get("cost") or {}).get("total", 0) or 0,
+    )
 
 
 def _content_preview(content):
@@ -78,68 +130,1228 @@ def _content_preview(content):
     return ""
 
 
+# --- Transcript ingestion ---
+# Session transcripts are append-only, so each file is followed like `tail -f`:
+# we remember its inode and the byte offset we have decoded up to, and on the
+# next refresh only the appended bytes are read. A file is re-read from the
+# start only when it shrinks or is replaced (inode change).
+
+# Rollup resolutions, as the length of the ISO timestamp prefix that names a
+# bucket: "2026-02-18T13:05", "2026-02-18T13" and "2026-02-18".
+_RESOLUTIONS = {"minute": 16, "hour": 13, "day": 10}
+
+
+class _Rollup:
+    """Time buckets of {"tokens", "cost", "messages"}, kept sorted for range queries."""
+
+    __slots__ = ("buckets", "keys")
+
+    def __init__(self):
+        self.buckets = {}
+        self.keys = []
+
+    def add(self, key, tokens, cost, messages=1):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = {"tokens": 0, "cost": 0, "messages": 0}
+            # Transcripts are written in time order, so this is nearly always an append
+            if not self.keys or key > self.keys[-1]:
+                self.keys.append(key)
+            else:
+                bisect.insort(self.keys, key)
+        bucket["tokens"] += tokens
+        bucket["cost"] += cost
+        bucket["messages"] += messages
+
+    def merge(self, other):
+        for key in other.keys:
+            b = other.buckets[key]
+            self.add(key, b["tokens"], b["cost"], b["messages"])
+
+    def window(self, lo=None, hi=None):
+        """Copy of the buckets with lo <= key <= hi; None leaves that end open."""
+        i = bisect.bisect_left(self.keys, lo) if lo else 0
+        j = bisect.bisect_right(self.keys, hi) if hi else len(self.keys)
+        return {k: dict(self.buckets[k]) for k in self.keys[i:j]}
+
+
+def _round_costs(buckets):
+    """Round bucket costs in place to the 6 places of totalCost.
+
+    The same costs summed in another order (in SQL, or per model and then
+    per bucket) differ in the last digits; rounding makes them agree.
+    """
+    for b in buckets.values():
+        b["cost"] = round(b["cost"], 6)
+    return buckets
+
+
+def _new_rollups():
+    return {res: {"total": _Rollup(), "model": {}, "provider": {}} for res in _RESOLUTIONS}
+
+
+def _new_counters():
+    rollups = _new_rollups()
+    return {
+        "totalMessages": 0,
+        "assistantMessages": 0,
+        "tokensInput": 0,
+        "tokensOutput": 0,
+        "tokensCacheRead": 0,
+        "tokensCacheWrite": 0,
+        "totalTokens": 0,
+        "totalCost": 0,
+        "models": set(),
+        "firstActive": None,
+        "lastActive": None,
+        # Per resolution: team-wide, per-model and per-provider rollups
+        "rollups": rollups,
+        "timeSeries": rollups["hour"]["total"].buckets,
+    }
+
+
+def _count_message(c, rec):
+    """Fold one decoded message record into a counters dict."""
+    c["totalMessages"] += 1
+    ts = rec.get("timestamp")
+    if ts:
+        if c["lastActive"] is None or ts > c["lastActive"]:
+            c["lastActive"] = ts
+        if c["firstActive"] is None or ts < c["firstActive"]:
+            c["firstActive"] = ts
+    msg = rec.get("message", {})
+    usage = msg.get("usage")
+    if msg.get("role") != "assistant" or not usage:
+        return
+    c["assistantMessages"] += 1
+    input_tokens, output_tokens, cache_read, cache_write, tokens, cost = _usage_numbers(usage)
+    c["tokensInput"] += input_tokens
+    c["tokensOutput"] += output_tokens
+    c["tokensCacheRead"] += cache_read
+    c["tokensCacheWrite"] += cache_write
+    c["totalTokens"] += tokens
+    c["totalCost"] += max(cost, 0)
+    model = _intern(msg.get("model"))
+    if model:
+        c["models"].add(model)
+    if not ts:
+        return
+    model = model or "unknown"
+    provider = _intern(msg.get("provider")) or "unknown"
+    for res, width in _RESOLUTIONS.items():
+        key = ts[:width]
+        rollups = c["rollups"][res]
+        rollups["total"].add(key, tokens, cost)
+        rollups["model"].setdefault(model, _Rollup()).add(key, tokens, cost)
+        rollups["provider"].setdefault(provider, _Rollup()).add(key, tokens, cost)
+
+
+def _merge_counters(into, c):
+    for k in ("totalMessages", "assistantMessages", "tokensInput", "tokensOutput",
+              "tokensCacheRead", "tokensCacheWrite", "totalTokens", "totalCost"):
+        into[k] += c[k]
+    into["models"] |= c["models"]
+    if c["lastActive"] and (into["lastActive"] is None or c["lastActive"] > into["lastActive"]):
+        into["lastActive"] = c["lastActive"]
+    if c["firstActive"] and (into["firstActive"] is None or c["firstActive"] < into["firstActive"]):
+        into["firstActive"] = c["firstActive"]
+    for res, rollups in c["rollups"].items():
+        target = into["rollups"][res]
+        target["total"].merge(rollups["total"])
+        for dim in ("model", "provider"):
+            for name, r in rollups[dim].items():
+                target[dim].setdefault(name, _Rollup()).merge(r)
+
+
+def _read_appended(path, offset, size, rows=False):
+    """Decode the message records between `offset` and `size` in a transcript.
+
+    Returns (counters, consumed_bytes), the records folded into a counters
+    dict as they are read; with `rows`, a list of message index rows instead
+    of the counters. A trailing line without a newline is only consumed
+    once it is a complete record, otherwise we wait for the writer to
+    finish it.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read(size - offset)
+    out = [] if rows else _new_counters()
+    pos = 0
+    while pos < len(chunk):
+        nl = chunk.find(b"\n", pos)
+        if nl == -1:
+            try:
+                json.loads(chunk[pos:])
+            except ValueError:
+                break
+            line = chunk[pos:]
+            end = len(chunk)
+        else:
+            line = chunk[pos:nl]
+            end = nl + 1
+        rec = transcripts.decode(line, ("message",)) if line.strip() else None
+        pos = end
+        if rec is None:
+            continue
+        if rows:
+            out.append(_index_row(rec))
+        else:
+            _count_message(out, rec)
+    return out, pos
+
+
+# --- Parallel aggregation ---
+# AGGREGATE_EXECUTOR picks how transcript work is spread out: "serial" (the
+# default), "thread" for I/O-bound session directories, or "process" to run
+# the JSON decoding on AGGREGATE_WORKERS cores. Work fans out per agent and
+# per file, and results are always merged back in the serial order, so every
+# mode produces identical output.
+
+AGGREGATE_EXECUTOR = os.environ.get("AGGREGATE_EXECUTOR", "serial")
+AGGREGATE_WORKERS = int(os.environ.get("AGGREGATE_WORKERS", 0)) or os.cpu_count() or 1
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(kind):
+    """Return the shared pool for this process, creating it on first use."""
+    key = (kind, os.getpid())
+    with _executors_lock:
+        pool = _executors.get(key)
+        if pool is None:
+            if kind == "process":
+                pool = concurrent.futures.ProcessPoolExecutor(max_workers=AGGREGATE_WORKERS)
+            elif kind == "agents":
+                pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(AGENT_NAMES))
+            else:
+                pool = concurrent.futures.ThreadPoolExecutor(max_workers=AGGREGATE_WORKERS)
+            pool = _executors[key] = pool
+    return pool
+
+
+def _decode_files(jobs, rows=False):
+    """Run `_read_appended` over (path, offset, size) jobs, preserving order."""
+    read = functools.partial(_read_appended, rows=rows)
+    if AGGREGATE_EXECUTOR == "serial" or len(jobs) < 2:
+        return [read(*job) for job in jobs]
+    return list(_executor(AGGREGATE_EXECUTOR).map(read, *zip(*jobs)))
+
+
+def _map_agents(fn):
+    """Apply fn to every agent in AGENT_NAMES order, concurrently if enabled."""
+    if AGGREGATE_EXECUTOR == "serial":
+        return [fn(name) for name in AGENT_NAMES]
+    return list(_executor("agents").map(fn, AGENT_NAMES))
+
+
+class _SessionTail:
+    """Read position in one JSONL transcript file."""
+
+    __slots__ = ("path", "inode", "size", "offset")
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.size = 0
+        self.offset = 0
+
+    def stat(self):
+        """Check the file for changes; True if it was truncated or replaced."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        reset = self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset)
+        self.inode = st.st_ino
+        self.size = st.st_size
+        return reset
+
+    def pending(self):
+        """The (offset, size) byte range still to be decoded, or None."""
+        return (self.offset, self.size) if self.size > self.offset else None
+
+
+class _AgentIngest:
+    """Tails for every transcript of one agent plus their running totals."""
+
+    def __init__(self, agent_name):
+        self.sessions_dir = os.path.join(AGENTS_DIR, agent_name, "sessions")
+        self.tails = {}
+        self.counters = _new_counters()
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            paths = glob.glob(os.path.join(self.sessions_dir, "*.jsonl")) if os.path.isdir(self.sessions_dir) else []
+            # Only the agent's running totals are kept, not each file's, so a
+            # transcript that was deleted, truncated or replaced means
+            # reading all of them again
+            rebuild = not set(self.tails) <= set(paths)
+            tails = {}
+            for fp in paths:
+                tail = tails[fp] = self.tails.get(fp) or _SessionTail(fp)
+                rebuild = tail.stat() or rebuild
+            self.tails = tails
+            if rebuild:
+                self.counters = _new_counters()
+                for tail in tails.values():
+                    tail.offset = 0
+            jobs = [(tail, tail.pending()) for tail in tails.values()]
+            jobs = [(tail, pending) for tail, pending in jobs if pending]
+            decoded = _decode_files([(tail.path, *pending) for tail, pending in jobs])
+            for (tail, _), (new, consumed) in zip(jobs, decoded):
+                _merge_counters(self.counters, new)
+                tail.offset += consumed
+            return list(tails.values())
+
+
+_INGEST = {}
+_INGEST_LOCK = threading.Lock()
+
+
+def _ingest(agent_name):
+    """Bring an agent's transcripts up to date and return its ingest state."""
+    with _INGEST_LOCK:
+        state = _INGEST.get(agent_name)
+        if state is None:
+            state = _INGEST[agent_name] = _AgentIngest(agent_name)
+    state.refresh()
+    return state
+
+
 def build_agent_stats(agent_name):
-    messages = parse_sessions(agent_name)
-    assistant_msgs = [m for m in messages if m["role"] == "assistant" and m.get("usage")]
-    total_input = sum(m["usage"].get("input", 0) or 0 for m in assistant_msgs)
-    total_output = sum(m["usage"].get("output", 0) or 0 for m in assistant_msgs)
-    total_cache_read = sum(m["usage"].get("cacheRead", 0) or 0 for m in assistant_msgs)
-    total_cache_write = sum(m["usage"].get("cacheWrite", 0) or 0 for m in assistant_msgs)
-    total_tokens = sum(m["usage"].get("totalTokens", 0) or 0 for m in assistant_msgs)
-    total_cost = sum(max((m["usage"].get("cost") or {}).get("total", 0) or 0, 0) for m in assistant_msgs)
-
-    models = set(m.get("model") for m in assistant_msgs if m.get("model"))
-    timestamps = [m["timestamp"] for m in messages if m.get("timestamp")]
-    last_active = max(timestamps) if timestamps else None
-
-    # Time series: bucket by hour
-    time_series = {}
-    for m in assistant_msgs:
-        ts = m.get("timestamp", "")[:13]  # "2026-02-18T13"
-        if ts:
-            bucket = time_series.setdefault(ts, {"tokens": 0, "cost": 0, "messages": 0})
-            bucket["tokens"] += m["usage"].get("totalTokens", 0) or 0
-            bucket["cost"] += (m["usage"].get("cost") or {}).get("total", 0) or 0
-            bucket["messages"] += 1
-
-    # Calculate active hours from timestamps (time between first and last msg per session-hour)
-    active_hours = len(time_series)  # each bucket is ~1 hour of activity
+    if _message_index:
+        return _agent_stats(agent_name, _message_index.agent_stats(agent_name))
+    state = _ingest(agent_name)
+    # Another request may be refreshing the same counters; copy out under its lock
+    with state.lock:
+        return _agent_stats(agent_name, state.counters)
+
+
+def _agent_stats(agent_name, c):
+    """Stats response built from a counters dict; shares nothing with `c`."""
+    # Each hourly bucket is ~1 hour of activity
+    active_hours = len(c["timeSeries"])
 
     # Estimate human-equivalent hours saved:
     # Average human writes ~40 words/min = ~53 tokens/min = ~3200 tokens/hour
     # Agent output tokens represent work a human would have to do
+    total_output = c["tokensOutput"]
     human_equiv_hours = round(total_output / 3200, 1) if total_output else 0
 
-    # Calculate first active timestamp
-    first_active = min(timestamps) if timestamps else None
-
     return {
         "agent": agent_name,
-        "totalMessages": len(messages),
-        "assistantMessages": len(assistant_msgs),
-        "tokensInput": total_input,
+        "totalMessages": c["totalMessages"],
+        "assistantMessages": c["assistantMessages"],
+        "tokensInput": c["tokensInput"],
         "tokensOutput": total_output,
-        "tokensCacheRead": total_cache_read,
-        "tokensCacheWrite": total_cache_write,
-        "totalTokens": total_tokens,
-        "totalCost": round(total_cost, 6),
-        "models": sorted(models),
-        "lastActive": last_active,
-        "firstActive": first_active,
+        "tokensCacheRead": c["tokensCacheRead"],
+        "tokensCacheWrite": c["tokensCacheWrite"],
+        "totalTokens": c["totalTokens"],
+        "totalCost": round(c["totalCost"], 6),
+        "models": sorted(c["models"]),
+        "lastActive": c["lastActive"],
+        "firstActive": c["firstActive"],
         "activeHours": active_hours,
         "humanEquivHours": human_equiv_hours,
-        "timeSeries": time_series,
+        "timeSeries": _round_costs({k: dict(v) for k, v in c["timeSeries"].items()}),
+    }
+
+
+def build_agent_series(agent_name, bucket="hour", lo=None, hi=None):
+    """Windowed time series for one agent: totals plus per-model and per-provider.
+
+    `lo` and `hi` are bucket keys at the requested resolution (inclusive);
+    None leaves that end of the window open.
+    """
+    if _message_index:
+        out = _message_index.series(agent_name, bucket, lo, hi)
+    else:
+        state = _ingest(agent_name)
+        with state.lock:
+            rollups = state.counters["rollups"][bucket]
+            out = {"timeSeries": rollups["total"].window(lo, hi)}
+            for dim, key in (("model", "modelSeries"), ("provider", "providerSeries")):
+                out[key] = {}
+                for name, r in rollups[dim].items():
+                    w = r.window(lo, hi)
+                    if w:
+                        out[key][name] = w
+    _round_costs(out["timeSeries"])
+    for key in ("modelSeries", "providerSeries"):
+        for buckets in out[key].values():
+            _round_costs(buckets)
+    return out
+
+
+def _window_key(value, bucket, now):
+    """Bucket key for a from/to parameter.
+
+    Accepts an ISO 8601 timestamp, or a duration back from now such as
+    "30m", "24h" or "90d".
+    """
+    if not value:
+        return None
+    unit = {"m": "minutes", "h": "hours", "d": "days"}.get(value[-1:])
+    if unit and value[:-1].isdigit():
+        dt = now - timedelta(**{unit: int(value[:-1])})
+    else:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M")[:_RESOLUTIONS[bucket]]
+
+
+# --- Message index (optional) ---
+# With MESSAGE_INDEX set to a file path, transcripts are mirrored into an
+# SQLite database (one row per message) and the stats/activity/messages
+# endpoints become indexed queries. Per-file offsets are stored alongside the
+# rows, so a restart only has to read what was appended while we were down.
+
+MESSAGE_INDEX = os.environ.get("MESSAGE_INDEX", "")
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT,
+    agent TEXT NOT NULL,
+    file TEXT NOT NULL,
+    timestamp TEXT,
+    role TEXT,
+    model TEXT,
+    provider TEXT,
+    stop_reason TEXT,
+    has_usage INTEGER NOT NULL,
+    input INTEGER NOT NULL,
+    output INTEGER NOT NULL,
+    cache_read INTEGER NOT NULL,
+    cache_write INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    cost,  -- untyped so integer and float costs sum like they do in Python
+    usage TEXT,
+    preview TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_agent_ts ON messages (agent, timestamp);
+CREATE INDEX IF NOT EXISTS messages_role_ts ON messages (role, timestamp);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages (timestamp);
+CREATE INDEX IF NOT EXISTS messages_file ON messages (file);
+"""
+
+_INDEX_COLUMNS = "id, timestamp, role, model, provider, stop_reason, usage, preview, agent"
+
+
+def _index_row(rec):
+    """Values for a messages row, less the agent and file columns."""
+    m = _Message(rec)
+    return (
+        m.id, m.timestamp or None, m.role,
+        m.model, m.provider, m.stop_reason,
+        1 if m.usage else 0,
+        *_usage_numbers(m.usage),
+        json.dumps(m.usage) if m.usage is not None else None,
+        m.preview or "",
+    )
+
+
+def _message_from_row(row):
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "role": row[2],
+        "model": row[3],
+        "provider": row[4],
+        "stopReason": row[5],
+        "usage": json.loads(row[6]) if row[6] is not None else None,
+        "content_preview": row[7],
+        "agent": row[8],
+    }
+
+
+class _MessageIndex:
+    """SQLite mirror of every agent's transcript messages."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # gunicorn forks workers, and an SQLite handle must not cross a fork.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_INDEX_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def sync(self, agent_name):
+        """Bring the rows for one agent in line with its session files."""
+        sessions_dir = os.path.join(AGENTS_DIR, agent_name, "sessions")
+        paths = glob.glob(os.path.join(sessions_dir, "*.jsonl")) if os.path.isdir(sessions_dir) else []
+        stats = {}
+        for fp in paths:
+            try:
+                stats[fp] = os.stat(fp)
+            except OSError:
+                pass
+        with self.lock:
+            conn = self.conn
+            known = {r[0]: r[1:] for r in conn.execute(
+                "SELECT path, inode, size, offset FROM files WHERE agent = ?", (agent_name,))}
+            if all(fp in known and known[fp][:2] == (st.st_ino, st.st_size) for fp, st in stats.items()) \
+                    and set(known) == set(stats):
+                return
+            # IMMEDIATE takes the write lock up front so two workers never
+            # ingest the same appended bytes twice.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = {r[0]: r[1:] for r in conn.execute(
+                    "SELECT path, inode, size, offset FROM files WHERE agent = ?", (agent_name,))}
+                for fp in set(known) - set(stats):
+                    conn.execute("DELETE FROM messages WHERE file = ?", (fp,))
+                    conn.execute("DELETE FROM files WHERE path = ?", (fp,))
+                offsets = {}
+                for fp, st in stats.items():
+                    inode, size, offset = known.get(fp, (None, 0, 0))
+                    if inode is not None and (inode != st.st_ino or st.st_size < offset):
+                        conn.execute("DELETE FROM messages WHERE file = ?", (fp,))
+                        offset = 0
+                    offsets[fp] = offset
+                jobs = [(fp, offsets[fp], st.st_size) for fp, st in stats.items() if st.st_size > offsets[fp]]
+                for (fp, _, _), (new, consumed) in zip(jobs, _decode_files(jobs, rows=True)):
+                    conn.executemany(
+                        "INSERT INTO messages (id, timestamp, role, model, provider, stop_reason, has_usage,"
+                        " input, output, cache_read, cache_write, total_tokens, cost, usage, preview, agent, file)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [row + (agent_name, fp) for row in new])
+                    offsets[fp] += consumed
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, agent, inode, size, offset) VALUES (?, ?, ?, ?, ?)",
+                    [(fp, agent_name, st.st_ino, st.st_size, offsets[fp]) for fp, st in stats.items()])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def agent_stats(self, agent_name):
+        """Return the counters dict for one agent, computed in SQL."""
+        self.sync(agent_name)
+        c = _new_counters()
+        with self.lock:
+            conn = self.conn
+            total, first, last = conn.execute(
+                "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM messages WHERE agent = ?",
+                (agent_name,)).fetchone()
+            row = conn.execute(
+                "SELECT COUNT(*), TOTAL(input), TOTAL(output), TOTAL(cache_read), TOTAL(cache_write),"
+                " TOTAL(total_tokens), TOTAL(MAX(cost, 0)) FROM messages"
+                " WHERE agent = ? AND role = 'assistant' AND has_usage = 1", (agent_name,)).fetchone()
+            models = conn.execute(
+                "SELECT DISTINCT model FROM messages WHERE agent = ? AND role = 'assistant'"
+                " AND has_usage = 1 AND model IS NOT NULL AND model != ''", (agent_name,)).fetchall()
+            buckets = conn.execute(
+                "SELECT substr(timestamp, 1, 13) AS hour, SUM(total_tokens), SUM(cost), COUNT(*) FROM messages"
+                " WHERE agent = ? AND role = 'assistant' AND has_usage = 1 AND timestamp IS NOT NULL"
+                " GROUP BY hour", (agent_name,)).fetchall()
+        c["totalMessages"], c["firstActive"], c["lastActive"] = total, first, last
+        (c["assistantMessages"], c["tokensInput"], c["tokensOutput"], c["tokensCacheRead"],
+         c["tokensCacheWrite"], c["totalTokens"], c["totalCost"]) = row
+        for k in ("tokensInput", "tokensOutput", "tokensCacheRead", "tokensCacheWrite", "totalTokens"):
+            c[k] = int(c[k])
+        if not c["assistantMessages"]:
+            c["totalCost"] = 0
+        c["models"] = {r[0] for r in models}
+        c["timeSeries"] = {h: {"tokens": t, "cost": cost, "messages": n} for h, t, cost, n in buckets}
+        return c
+
+    def series(self, agent_name, bucket, lo, hi):
+        """Same shape as build_agent_series, as a range scan over the (agent, timestamp) index."""
+        self.sync(agent_name)
+        width = _RESOLUTIONS[bucket]
+        sql = ("SELECT substr(timestamp, 1, ?) AS b, model, provider, SUM(total_tokens), SUM(cost), COUNT(*)"
+               " FROM messages WHERE agent = ? AND role = 'assistant' AND has_usage = 1 AND timestamp IS NOT NULL")
+        params = [width, agent_name]
+        if lo:
+            sql += " AND timestamp >= ?"
+            params.append(lo)
+        if hi:
+            # "~" sorts after every character of an ISO timestamp
+            sql += " AND timestamp < ?"
+            params.append(hi + "~")
+        sql += " GROUP BY b, model, provider ORDER BY b"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        out = {"timeSeries": {}, "modelSeries": {}, "providerSeries": {}}
+        for b, model, provider, tokens, cost, n in rows:
+            for series in (out["timeSeries"],
+                           out["modelSeries"].setdefault(model or "unknown", {}),
+                           out["providerSeries"].setdefault(provider or "unknown", {})):
+                bucket_stats = series.setdefault(b, {"tokens": 0, "cost": 0, "messages": 0})
+                bucket_stats["tokens"] += tokens
+                bucket_stats["cost"] += cost
+                bucket_stats["messages"] += n
+        return out
+
+    def recent(self, limit, agents=None, roles=None, before=None, after=None):
+        """Messages with a preview in feed order, optionally filtered and paged by cursor."""
+        agents = agents or AGENT_NAMES
+        for agent in agents:
+            self.sync(agent)
+        sql = (f"SELECT {_INDEX_COLUMNS} FROM messages WHERE preview != ''"
+               f" AND agent IN ({','.join('?' * len(agents))})")
+        params = list(agents)
+        if roles:
+            sql += f" AND role IN ({','.join('?' * len(roles))})"
+            params += list(roles)
+        if before is not None:
+            sql += " AND (coalesce(timestamp, ''), coalesce(id, '')) < (?, ?)"
+            params += list(before)
+        order = "DESC"
+        if after is not None:
+            sql += " AND (coalesce(timestamp, ''), coalesce(id, '')) > (?, ?)"
+            params += list(after)
+            order = "ASC"
+        sql += f" ORDER BY coalesce(timestamp, '') {order}, coalesce(id, '') {order} LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = [_message_from_row(r) for r in self.conn.execute(sql, params)]
+        if after is not None:
+            rows.reverse()
+        return rows
+
+
+_message_index = _MessageIndex(MESSAGE_INDEX) if MESSAGE_INDEX else None
+
+
+def _warm_message_index():
+    for agent in AGENT_NAMES:
+        try:
+            _message_index.sync(agent)
+        except sqlite3.Error as e:
+            app.logger.warning("message index sync failed for %s: %s", agent, e)
+
+
+if _message_index:
+    threading.Thread(target=_warm_message_index, daemon=True).start()
+
+
+def build_team_totals(agents):
+    return {
+        "totalCost": round(sum(a["totalCost"] for a in agents), 6),
+        "totalTokens": sum(a["totalTokens"] for a in agents),
+        "totalMessages": sum(a["totalMessages"] for a in agents),
+        "assistantMessages": sum(a["assistantMessages"] for a in agents),
+        "totalActiveHours": sum(a["activeHours"] for a in agents),
+        "totalHumanEquivHours": round(sum(a["humanEquivHours"] for a in agents), 1),
     }
 
 
+# --- Newest-first feeds ---
+# Feeds are ordered by (timestamp, id), newest first. Transcripts are appended
+# in time order, so each file read backwards is a stream of messages from
+# newest to oldest, and no line in a file is newer than the file's mtime.
+# The feeds merge these streams through a heap and only open a file once its
+# mtime shows it could still hold one of the N newest messages, so "last 20
+# messages" costs the same however much history has piled up. Pages further
+# back start each file at the cursor's timestamp, found by binary search.
+
+def _feed_key(m):
+    return (m.get("timestamp") or "", m.get("id") or "")
+
+
+def _file_messages(path, start=None, newer=False):
+    """Messages of one transcript in feed order from byte offset `start`.
+
+    Newest first, reading backwards from `start` (default: EOF); with
+    `newer`, oldest first reading forwards from `start`.
+    """
+    lines = transcripts.iter_forward(path, start or 0) if newer else transcripts.iter_reverse(path, start)
+    # Messages sharing a timestamp are put in id order
+    run = []
+    for line in lines:
+        rec = transcripts.decode(line, ("message",))
+        if rec is None:
+            continue
+        m = _Message(rec)
+        if run and m.timestamp != run[-1].timestamp:
+            yield from sorted(run, key=_Message.feed_key, reverse=not newer)
+            run = []
+        run.append(m)
+    yield from sorted(run, key=_Message.feed_key, reverse=not newer)
+
+
+class _FeedHead:
+    """The next message of one feed stream, ordered for a heap."""
+
+    __slots__ = ("key", "order", "newer", "msg", "agent", "stream")
+
+    def __init__(self, msg, agent, order, stream, newer):
+        self.key = msg.feed_key()
+        self.msg = msg
+        self.agent = agent
+        self.order = order
+        self.stream = stream
+        self.newer = newer
+
+    def __lt__(self, other):
+        if self.key != other.key:
+            return self.key < other.key if self.newer else self.key > other.key
+        return self.order < other.order
+
+
+def feed_messages(limit, agents=None, predicate=None, before=None, after=None):
+    """Up to `limit` messages that pass `predicate`, newest first.
+
+    Without a cursor this is the newest page. `before` and `after` are
+    (timestamp, id) cursors: the page holds the messages just older than
+    `before`, or just newer than `after`.
+    """
+    newer = after is not None
+    cursor = after if newer else before
+    files = []
+    for agent in agents or AGENT_NAMES:
+        sessions_dir = os.path.join(AGENTS_DIR, agent, "sessions")
+        for fp in glob.glob(os.path.join(sessions_dir, "*.jsonl")):
+            try:
+                mtime = os.stat(fp).st_mtime
+            except OSError:
+                continue
+            stamp = datetime.fromtimestamp(mtime, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+            if newer and stamp < cursor[0]:
+                continue
+            files.append((stamp, agent, fp, len(files)))
+    files.sort(key=lambda f: f[0], reverse=True)
+
+    def wanted(m):
+        if cursor is not None:
+            key = m.feed_key()
+            if (key <= cursor) if newer else (key >= cursor):
+                return False
+        return predicate is None or predicate(m)
+
+    heap = []
+    out = []
+    opened = 0
+
+    def advance(stream, agent, order):
+        for m in stream:
+            if wanted(m):
+                heapq.heappush(heap, _FeedHead(m, agent, order, stream, newer))
+                return
+
+    while len(out) < limit:
+        # Open every file that could still hold something newer than the best
+        # candidate; an oldest-first page needs all of them from the start.
+        while opened < len(files) and (newer or not heap or files[opened][0] >= heap[0].key[0]):
+            _, agent, fp, order = files[opened]
+            start = None
+            if cursor is not None:
+                start = transcripts.seek_timestamp(fp, cursor[0], strict=not newer)
+            advance(_file_messages(fp, start, newer), agent, order)
+            opened += 1
+        if not heap:
+            break
+        head = heapq.heappop(heap)
+        out.append(head.msg.as_dict(head.agent))
+        advance(head.stream, head.agent, head.order)
+    if newer:
+        out.reverse()
+    return out
+
+
 def build_recent_activity(limit=20):
-    all_msgs = []
+    if _message_index:
+        return _message_index.recent(limit)
+    return feed_messages(limit, predicate=lambda m: m.preview)
+
+
+def build_messages(agent_filter="", role_filter="", limit=100, before=None, after=None):
+    """Page of user/assistant messages with a preview, newest first.
+
+    Filters are applied while scanning; `before`/`after` are (timestamp, id)
+    cursors as produced by encode_cursor.
+    """
+    agents = [agent_filter] if agent_filter and agent_filter in AGENT_NAMES else AGENT_NAMES
+    if _message_index:
+        roles = [role_filter] if role_filter else ["user", "assistant"]
+        if role_filter not in ("", "user", "assistant"):
+            return []
+        return _message_index.recent(limit, agents, roles, before, after)
+
+    def wanted(m):
+        if not m.preview or m.role not in ("user", "assistant"):
+            return False
+        return not role_filter or m.role == role_filter
+
+    return feed_messages(limit, agents, wanted, before, after)
+
+
+def encode_cursor(m):
+    """Opaque page cursor for a feed message."""
+    return base64.urlsafe_b64encode(json.dumps(list(_feed_key(m))).encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """(timestamp, id) from an encode_cursor string; ValueError if malformed."""
+    try:
+        ts, mid = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except (TypeError, binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(e)
+    if not isinstance(ts, str) or not isinstance(mid, str):
+        raise ValueError("bad cursor")
+    return ts, mid
+
+
+# --- Snapshot ---
+# Everything the stats endpoints serve is derived from the session files, so
+# it is computed once per data generation and shared: a new generation starts
+# only when a stat() of the transcripts shows that a file changed.
+
+def _sessions_fingerprint():
+    """(path, inode, size, mtime) of every transcript, from stat() alone."""
+    entries = []
     for agent in AGENT_NAMES:
-        for m in parse_sessions(agent):
-            if m.get("content_preview"):
-                all_msgs.append({**m, "agent": agent})
-    all_msgs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    return all_msgs[:limit]
+        try:
+            with os.scandir(os.path.join(AGENTS_DIR, agent, "sessions")) as it:
+                for e in it:
+                    if e.name.endswith(".jsonl"):
+                        st = e.stat()
+                        entries.append((e.path, st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            continue
+    return tuple(sorted(entries))
+
+
+# --- Request coalescing ---
+# Expensive results are computed by one caller per key; everyone who asks
+# for the same key meanwhile waits for that computation instead of starting
+# their own.
+
+class _SingleFlight:
+    """At most one in-flight call per key, its result shared by all callers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = concurrent.futures.Future()
+        if leader:
+            try:
+                call.set_result(fn())
+            except BaseException as e:
+                call.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+        return call.result()
+
+    def start(self, key, fn):
+        """Run `fn` for `key` on a background thread unless it is already running."""
+        with self.lock:
+            if key in self.calls:
+                return
+
+        def run():
+            try:
+                self.do(key, fn)
+            except Exception:
+                app.logger.exception("background refresh of %r failed", key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+_single_flight = _SingleFlight()
+
+
+def _dumps(obj):
+    """Serialise a response body exactly as jsonify would."""
+    return (app.json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+# --- Compression ---
+# JSON responses over COMPRESS_MIN_SIZE bytes are gzip- or (when the brotli
+# module is installed) brotli-encoded if the client accepts it. Snapshot
+# bodies are compressed once per generation and kept with the snapshot.
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(bytes(body), quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _accepted_encoding():
+    """Preferred encoding the client accepts, or None for identity."""
+    return request.accept_encodings.best_match(_ENCODINGS)
+
+
+@app.after_request
+def _compress_response(resp):
+    if resp.status_code != 200 or resp.mimetype != "application/json" or resp.direct_passthrough:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding is None:
+        encoding = _accepted_encoding()
+        data = resp.get_data() if encoding else b""
+        if len(data) < COMPRESS_MIN_SIZE:
+            return resp
+        resp.set_data(_compress(data, encoding))
+        resp.headers["Content-Encoding"] = encoding
+    # Each encoding is a different representation, so it gets its own ETag
+    tag, weak = resp.get_etag()
+    if tag and not weak:
+        resp.set_etag(f"{tag}-{encoding}")
+    return resp
+
+
+class _Snapshot:
+    """Agent stats, team totals and feeds for one data generation.
+
+    Built snapshots hold the decoded stats; snapshots loaded from the shared
+    file start from the serialised bodies and decode them only when needed.
+    """
+
+    def __init__(self, generation, fingerprint, agents=None, activity=None, bodies=None):
+        self.generation = generation
+        self.fingerprint = fingerprint
+        if agents is not None:
+            self.agents = agents
+        if activity is not None:
+            self.activity = activity
+        self._bodies = dict(bodies or {})
+        # Memoised query results for this generation
+        self._messages = {}
+        self._lock = threading.Lock()
+        self._flight = _SingleFlight()
+
+    @classmethod
+    def build(cls, generation, fingerprint):
+        return cls(generation, fingerprint,
+                   agents=_map_agents(build_agent_stats),
+                   activity=build_recent_activity(20))
+
+    @functools.cached_property
+    def agents(self):
+        return json.loads(bytes(self._bodies["stats"]))["agents"]
+
+    @functools.cached_property
+    def activity(self):
+        return json.loads(bytes(self._bodies["activity"]))["activity"]
+
+    @functools.cached_property
+    def by_agent(self):
+        return {a["agent"]: a for a in self.agents}
+
+    @functools.cached_property
+    def team(self):
+        return build_team_totals(self.agents)
+
+    def body(self, name, encoding=None):
+        """Serialised JSON body of the "stats" or "activity" endpoint, optionally compressed."""
+        with self._lock:
+            if name not in self._bodies:
+                if name == "stats":
+                    self._bodies[name] = _dumps({"agents": self.agents, "team": self.team})
+                else:
+                    self._bodies[name] = _dumps({"activity": self.activity})
+            if encoding is None:
+                return self._bodies[name]
+            key = f"{name}.{encoding}"
+            if key not in self._bodies:
+                self._bodies[key] = _compress(self._bodies[name], encoding)
+            return self._bodies[key]
+
+    def _memo(self, key, fn):
+        """fn() computed once for this generation, concurrent callers sharing it."""
+        with self._lock:
+            if key in self._messages:
+                return self._messages[key]
+
+        def compute():
+            value = fn()
+            with self._lock:
+                return self._messages.setdefault(key, value)
+
+        return self._flight.do(key, compute)
+
+    def windowed(self, bucket, lo, hi):
+        """Agent stats with time series cut to [lo, hi] at this resolution."""
+        def compute():
+            series = _map_agents(lambda name: build_agent_series(name, bucket, lo, hi))
+            return [{**stats, **s} for stats, s in zip(self.agents, series)]
+
+        return self._memo(("series", bucket, lo, hi), compute)
+
+    def messages(self, agent_filter="", role_filter="", limit=100):
+        """Message feed for these filters, computed at most once per generation."""
+        return self._memo((agent_filter, role_filter, limit),
+                          lambda: build_messages(agent_filter, role_filter, limit))
+
+
+# --- Shared snapshot ---
+# With several gunicorn workers, SHARED_SNAPSHOT names a file through which
+# they share one snapshot: whichever worker first sees a new generation takes
+# an exclusive lock, builds it and publishes the serialised bodies; the other
+# workers wait on the lock and then map the file instead of parsing anything.
+#
+# File layout: magic, 4-byte header length, JSON header
+# {"generation", "fingerprint", "sections": {name: [offset, length]}}, bodies.
+SHARED_SNAPSHOT = os.environ.get("SHARED_SNAPSHOT", "")
+_SHARED_MAGIC = b"PPSNAP1\n"
+
+
+def _fingerprint_digest(fingerprint):
+    return hashlib.sha1(repr(fingerprint).encode()).hexdigest()
+
+
+class _SharedSnapshot:
+    """Reader and writer for the snapshot file shared between workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.inode = None
+        self.map = None
+        self.header = None
+
+    def read(self):
+        """Header of the published snapshot, remapping the file if it was replaced."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if st.st_ino != self.inode:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            size = len(_SHARED_MAGIC) + 4
+            if mm[:len(_SHARED_MAGIC)] != _SHARED_MAGIC:
+                return None
+            (length,) = struct.unpack(">I", mm[len(_SHARED_MAGIC):size])
+            # Earlier mappings stay alive for as long as a response still
+            # references one of their bodies.
+            self.header = json.loads(mm[size:size + length])
+            self.map = mm
+            self.inode = st.st_ino
+        return self.header
+
+    def load(self, fingerprint):
+        """Snapshot for `fingerprint` if that is what the file holds, else None."""
+        header = self.read()
+        if not header or header["fingerprint"] != _fingerprint_digest(fingerprint):
+            return None
+        view = memoryview(self.map)
+        bodies = {name: view[off:off + length] for name, (off, length) in header["sections"].items()}
+        return _Snapshot(header["generation"], fingerprint, bodies=bodies)
+
+    def publish(self, snap):
+        """Atomically replace the file with `snap`'s bodies."""
+        bodies = {}
+        for name in ("stats", "activity"):
+            bodies[name] = snap.body(name)
+            if len(bodies[name]) >= COMPRESS_MIN_SIZE:
+                for encoding in _ENCODINGS:
+                    bodies[f"{name}.{encoding}"] = snap.body(name, encoding)
+        header = {"generation": snap.generation, "fingerprint": _fingerprint_digest(snap.fingerprint)}
+        # Offsets depend on the header length, which depends on the offsets
+        offset = 0
+        while True:
+            sections, pos = {}, offset
+            for name, body in bodies.items():
+                sections[name] = [pos, len(body)]
+                pos += len(body)
+            encoded = json.dumps({**header, "sections": sections}).encode()
+            if len(_SHARED_MAGIC) + 4 + len(encoded) == offset:
+                break
+            offset = len(_SHARED_MAGIC) + 4 + len(encoded)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_SHARED_MAGIC + struct.pack(">I", len(encoded)) + encoded)
+            for body in bodies.values():
+                f.write(body)
+        os.replace(tmp, self.path)
+
+    def snapshot(self, fingerprint, previous):
+        """The shared snapshot for `fingerprint`, building and publishing it if needed."""
+        snap = self.load(fingerprint)
+        if snap is not None:
+            return snap
+        with open(self.lock_path, "a") as lock:
+            # Only one worker builds; the rest block here until it publishes
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                snap = self.load(fingerprint)
+                if snap is None:
+                    header = self.read()
+                    generation = max(header["generation"] if header else 0,
+                                     previous.generation if previous else 0) + 1
+                    snap = _Snapshot.build(generation, fingerprint)
+                    self.publish(snap)
+                return snap
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_shared_snapshot = _SharedSnapshot(SHARED_SNAPSHOT) if SHARED_SNAPSHOT else None
+_snapshot = None
+
+# With STALE_WHILE_REVALIDATE=1 a request that finds the data changed gets
+# the previous snapshot straight away while the new one is built behind it.
+STALE_WHILE_REVALIDATE = os.environ.get("STALE_WHILE_REVALIDATE", "") not in ("", "0")
+
+
+def _rebuild_snapshot():
+    global _snapshot
+    fingerprint = _sessions_fingerprint()
+    snap = _snapshot
+    if snap is None or snap.fingerprint != fingerprint:
+        if _shared_snapshot:
+            snap = _shared_snapshot.snapshot(fingerprint, snap)
+        else:
+            snap = _Snapshot.build(snap.generation + 1 if snap else 1, fingerprint)
+        _snapshot = snap
+    return snap
+
+
+def current_snapshot():
+    """Return the snapshot for the current state of the session files."""
+    snap = _snapshot
+    if snap is not None and snap.fingerprint == _sessions_fingerprint():
+        return snap
+    if snap is not None and STALE_WHILE_REVALIDATE:
+        _single_flight.start("snapshot", _rebuild_snapshot)
+        return snap
+    return _single_flight.do("snapshot", _rebuild_snapshot)
+
+
+# WSGI servers only take bytes, so views of the shared file are copied out
+# a chunk at a time as the response is written.
+_BODY_CHUNK = 64 * 1024
+
+
+def _json_response(body):
+    """Response for a pre-serialised JSON body (bytes or a view of the shared file)."""
+    if isinstance(body, memoryview):
+        chunks = (bytes(body[i:i + _BODY_CHUNK]) for i in range(0, len(body), _BODY_CHUNK))
+    else:
+        chunks = [body]
+    resp = Response(chunks, mimetype="application/json")
+    resp.headers["Content-Length"] = str(len(body))
+    return resp
+
+
+def _snapshot_response(snap, name):
+    """Serve one of the snapshot's bodies, using its cached compressed copy if accepted."""
+    body = snap.body(name)
+    encoding = _accepted_encoding() if len(body) >= COMPRESS_MIN_SIZE else None
+    if encoding is None:
+        return _json_response(body)
+    resp = _json_response(snap.body(name, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+# --- Conditional GET ---
+# Read-only endpoints tag their responses with a strong ETag derived from
+# stat() of the files they are built from, so a poll that finds nothing
+# changed is answered with 304 before anything is loaded or parsed.
+
+def _file_fingerprint(*paths):
+    """(path, inode, size, mtime) of each file; missing files count too."""
+    entries = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            entries.append((path, st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            entries.append((path, None, None, None))
+    return tuple(entries)
+
+
+def conditional(validator):
+    """Answer If-None-Match with 304 while `validator()` is unchanged."""
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            tag = hashlib.sha1(repr((request.full_path, validator())).encode()).hexdigest()
+            variants = [tag] + [f"{tag}-{encoding}" for encoding in _ENCODINGS]
+            matched = next((t for t in variants if request.if_none_match.contains(t)), None)
+            if matched:
+                resp = Response(status=304)
+                resp.set_etag(matched)
+            else:
+                resp = app.make_response(f(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                resp.set_etag(tag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return decorated
+    return decorator
+
+
+def _snapshot_validator():
+    """Fingerprint of the snapshot this request will be served from.
+
+    Normally that of the session files right now; a stale snapshot served
+    while revalidating keeps its own, so clients don't cache it as current.
+    """
+    return current_snapshot().fingerprint
+
+
+def _stats_validator():
+    """Relative windows (from=24h) move with the clock, so those are revalidated each minute."""
+    if any(k in request.args for k in ("from", "to", "bucket")):
+        return _snapshot_validator(), datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M")
+    return _snapshot_validator()
+
+
+# --- Pages ---
+# The dashboard pages take no template context, so each is rendered once,
+# kept with a gzip copy, and re-rendered only when its template changes.
+_pages = {}
+
+
+def _render_page(name):
+    path = os.path.join(app.root_path, app.template_folder, name)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    page = _pages.get(name)
+    if page is None or page["key"] != key:
+        body = render_template(name).encode()
+        page = _pages[name] = {
+            "key": key,
+            "body": body,
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+            "tag": "%x-%x" % key,
+            "mtime": st.st_mtime,
+        }
+    encoding = request.accept_encodings.best_match(("gzip",))
+    resp = Response(page[encoding or "body"], mimetype="text/html")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(f"{page['tag']}-{encoding}" if encoding else page["tag"])
+    resp.last_modified = page["mtime"]
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
 
 
 @app.route("/login", methods=["GET", "POST"])
@@ -172,39 +1384,31 @@ def load_sprint():
 
 def save_sprint(data):
     with open(SPRINT_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+        json.dump(data, f, separators=(",", ":"))
 
 
 @app.route("/")
 @login_required
 def index():
-    return render_template("index.html")
+    return _render_page("index.html")
 
 @app.route('/api/data')
 @login_required
+@conditional(_snapshot_validator)
 def api_data():
-    agents = [build_agent_stats(name) for name in AGENT_NAMES]
-    team = {
-        "totalCost": round(sum(a["totalCost"] for a in agents), 6),
-        "totalTokens": sum(a["totalTokens"] for a in agents),
-        "totalMessages": sum(a["totalMessages"] for a in agents),
-        "assistantMessages": sum(a["assistantMessages"] for a in agents),
-        "totalActiveHours": sum(a["activeHours"] for a in agents),
-        "totalHumanEquivHours": round(sum(a["humanEquivHours"] for a in agents), 1),
-    }
-    return jsonify({"agents": agents, "team": team})
+    return _snapshot_response(current_snapshot(), "stats")
 
 
 @app.route("/team")
 @login_required
 def team():
-    return render_template("team.html")
+    return _render_page("team.html")
 
 
 @app.route("/sprint")
 @login_required
 def sprint():
-    return render_template("sprint.html")
+    return _render_page("sprint.html")
 
 
 @app.route("/api/sprint", methods=["GET"])
@@ -223,43 +1427,657 @@ def api_sprint_post():
 
 @app.route("/api/stats")
 @login_required
+@conditional(_stats_validator)
 def api_stats():
-    agents = [build_agent_stats(name) for name in AGENT_NAMES]
-    team = {
-        "totalCost": round(sum(a["totalCost"] for a in agents), 6),
-        "totalTokens": sum(a["totalTokens"] for a in agents),
-        "totalMessages": sum(a["totalMessages"] for a in agents),
-        "assistantMessages": sum(a["assistantMessages"] for a in agents),
-        "totalActiveHours": sum(a["activeHours"] for a in agents),
-        "totalHumanEquivHours": round(sum(a["humanEquivHours"] for a in agents), 1),
-    }
-    return jsonify({"agents": agents, "team": team})
+    """Agent and team stats.
+
+    Optional `from`, `to` and `bucket` (minute, hour or day) restrict the
+    time series to a window; without them the full hourly series is returned.
+    """
+    snap = current_snapshot()
+    if not any(k in request.args for k in ("from", "to", "bucket")):
+        return _snapshot_response(snap, "stats")
+    bucket = request.args.get("bucket", "hour")
+    if bucket not in _RESOLUTIONS:
+        abort(400)
+    now = datetime.now(timezone.utc)
+    try:
+        lo = _window_key(request.args.get("from"), bucket, now)
+        hi = _window_key(request.args.get("to"), bucket, now)
+    except (ValueError, OverflowError):
+        abort(400)
+    return jsonify({
+        "agents": snap.windowed(bucket, lo, hi),
+        "team": snap.team,
+        "range": {"from": lo, "to": hi, "bucket": bucket},
+    })
 
 
 @app.route("/api/activity")
 @login_required
+@conditional(_snapshot_validator)
 def api_activity():
-    return jsonify({"activity": build_recent_activity(20)})
+    return _snapshot_response(current_snapshot(), "activity")
+
+
+# --- Live stream ---
+# One watcher thread polls the session files and fans deltas out to every
+# connected /api/stream client, so server work no longer scales with the
+# number of open dashboards.
+#
+# Each open stream still ties up a worker thread, though. A worker serves
+# at most STREAM_MAX_CLIENTS streams and answers 503 beyond that (the page
+# then polls instead), and streams end after STREAM_MAX_AGE seconds, so
+# the browser reconnects and stream slots keep changing hands.
+
+STREAM_INTERVAL = float(os.environ.get("STREAM_INTERVAL", 2))
+STREAM_KEEPALIVE = 15
+STREAM_MAX_CLIENTS = int(os.environ.get("STREAM_MAX_CLIENTS", 4))
+STREAM_MAX_AGE = float(os.environ.get("STREAM_MAX_AGE", 300))
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class _StreamHub:
+    """Shared session watcher that publishes stats and activity deltas."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.thread = None
+        self.snap = None
+        self.activity = []
+
+    def subscribe(self):
+        """Register a client and return (queue, snapshot event), or None if full."""
+        q = queue.Queue(maxsize=256)
+        with self.lock:
+            if len(self.clients) >= STREAM_MAX_CLIENTS:
+                return None
+            if self.thread is None:
+                self._reset()
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            snapshot = _sse("snapshot", {
+                "stats": {"agents": self.snap.agents, "team": self.snap.team},
+                "activity": self.activity,
+            })
+            self.clients.add(q)
+        return q, snapshot
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.clients.discard(q)
+
+    def publish(self, event, data):
+        payload = _sse(event, data)
+        with self.lock:
+            for q in list(self.clients):
+                try:
+                    q.put_nowait(payload)
+                except queue.Full:
+                    # Too far behind: drop it, the browser reconnects and
+                    # starts over from a fresh snapshot.
+                    self.clients.discard(q)
+
+    def _reset(self):
+        self.snap = current_snapshot()
+        self.activity = self.snap.activity
+
+    def poll(self):
+        snap = current_snapshot()
+        if snap.generation == self.snap.generation:
+            return
+        changed = []
+        for stats in snap.agents:
+            prev = self.snap.by_agent.get(stats["agent"])
+            if stats == prev:
+                continue
+            prev_series = prev["timeSeries"] if prev else {}
+            delta = {k: v for k, v in stats.items() if k != "timeSeries"}
+            delta["timeSeries"] = {h: b for h, b in stats["timeSeries"].items() if prev_series.get(h) != b}
+            changed.append(delta)
+        # New activity is whatever sorts after the newest entry already sent;
+        # diffing snapshots works the same in every worker.
+        newest = _feed_key(self.activity[0]) if self.activity else ("", "")
+        fresh = [m for m in snap.activity if _feed_key(m) > newest]
+        self.snap = snap
+        if changed:
+            self.publish("stats", {"agents": changed, "team": snap.team})
+        if fresh:
+            self.activity = (fresh + self.activity)[:20]
+            self.publish("activity", {"activity": fresh[:20]})
+
+    def _run(self):
+        while True:
+            time.sleep(STREAM_INTERVAL)
+            with self.lock:
+                if not self.clients:
+                    self.thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                app.logger.exception("stream poll failed")
+
+
+_stream_hub = _StreamHub()
+
+
+@app.route("/api/stream")
+@login_required
+def api_stream():
+    """Server-Sent Events: a snapshot on connect, then stats and activity deltas."""
+    subscription = _stream_hub.subscribe()
+    if subscription is None:
+        return Response("Too many live streams, poll instead\n", status=503,
+                        mimetype="text/plain", headers={"Retry-After": "60"})
+    q, snapshot = subscription
+    deadline = time.monotonic() + STREAM_MAX_AGE
+
+    def events():
+        try:
+            yield snapshot
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return  # the browser reconnects
+                try:
+                    yield q.get(timeout=min(STREAM_KEEPALIVE, remaining))
+                except queue.Empty:
+                    with _stream_hub.lock:
+                        if q not in _stream_hub.clients:
+                            return
+                    yield ": keepalive\n\n"
+        finally:
+            _stream_hub.unsubscribe(q)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- JSON stores ---
+# sprints.json, goals.json and docs_meta.json stay plain JSON arrays of
+# {"id": ...} records, but are no longer rewritten on every change. Each
+# store keeps the records in memory and appends every mutation to
+# "<file>.wal" as one JSON line, fsynced before it is applied. Every
+# STORE_COMPACT_EVERY mutations the records are written to a temporary
+# file that is renamed over the JSON file, and the log starts over.
+#
+# Before a compaction renames the new file into place it logs a
+# {"compacted": <inode of the new file>} marker, so after a crash in
+# between we can tell whether the logged changes are already in the file.
+#
+# Several worker processes can share a store: mutations and compactions
+# hold an exclusive flock on "<file>.lock" and first catch up with the log,
+# so ids and read-modify-writes never race; full reloads hold it shared so
+# they never see a compaction half done.
+STORE_COMPACT_EVERY = int(os.environ.get("STORE_COMPACT_EVERY", 100))
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _fsync_dir(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _JsonStore:
+    """Journaled in-memory working set of a JSON array file.
+
+    An optional `index` (with clear/add/remove) is kept in step with every
+    change to the records.
+    """
+
+    def __init__(self, path, index=None):
+        self.path = path
+        self.index = index
+        self.wal_path = path + ".wal"
+        self.lock_path = path + ".lock"
+        self.lock = threading.RLock()
+        self.lock_file = None  # open while this process holds the flock
+        self.items = None  # id -> record, in file order
+        self.file_key = None
+        self.wal_key = None
+        self.offset = 0  # bytes of the log applied so far
+        self.pending = 0  # mutations logged since the last compaction
+
+    # Reading
+
+    def fingerprint(self):
+        """stat() of the JSON file and its log, for ETags."""
+        return _file_fingerprint(self.path, self.wal_path)
+
+    def all(self):
+        """Copies of all records, in order."""
+        with self.lock:
+            self._sync()
+            return [dict(item) for item in self.items.values()]
+
+    def get(self, item_id):
+        with self.lock:
+            self._sync()
+            item = self.items.get(item_id)
+            return dict(item) if item is not None else None
+
+    def query(self, fn):
+        """fn(index) evaluated against the current records."""
+        with self.lock:
+            self._sync()
+            return fn(self.index)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Keep other threads and processes from changing the store meanwhile."""
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            yield
+
+    def next_id(self):
+        """The id the next insert will get (only certain while locked())."""
+        with self.lock:
+            self._sync()
+            return max(self.items, default=0) + 1
+
+    # Mutations: each returns the record as it is afterwards, or None if
+    # there is no record with that id.
+
+    def insert(self, fields):
+        """Add a record with the next free id."""
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            item = {"id": self.next_id(), **fields}
+            return self._log({"op": "insert", "item": item}, item["id"])
+
+    def update(self, item_id, fields, remove=()):
+        """Set `fields` on the record and drop the keys in `remove`."""
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            if item_id not in self.items:
+                return None
+            op = {"op": "update", "id": item_id, "fields": fields}
+            if remove:
+                op["remove"] = list(remove)
+            return self._log(op, item_id)
+
+    def append(self, item_id, key, value):
+        """Append `value` to the record's `key` list, creating it if needed."""
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            if item_id not in self.items:
+                return None
+            return self._log({"op": "append", "id": item_id, "key": key, "value": value}, item_id)
+
+    def delete(self, item_id):
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            if item_id in self.items:
+                self._log({"op": "delete", "id": item_id}, item_id)
+
+    def batch(self, changes):
+        """Make several changes as one log entry, so they happen all or not at all.
+
+        `changes` are ("insert", record), ("update", id, fields) and
+        ("delete", id) tuples, applied in order; inserted records carry
+        their ids (see next_id()).
+        """
+        ops = []
+        for kind, *args in changes:
+            if kind == "insert":
+                ops.append({"op": "insert", "item": args[0]})
+            elif kind == "update":
+                ops.append({"op": "update", "id": args[0], "fields": args[1]})
+            else:
+                ops.append({"op": "delete", "id": args[0]})
+        if not ops:
+            return
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            self._log({"op": "batch", "ops": ops}, None)
+
+    # Internals
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive):
+        """flock shared with other processes; re-entrant within this one (under self.lock)."""
+        if self.lock_file is not None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self.lock_file = f
+            try:
+                yield
+            finally:
+                self.lock_file = None
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _apply(self, op):
+        kind = op.get("op")
+        if kind == "batch":
+            for sub in op["ops"]:
+                self._apply(sub)
+            return
+        item_id = op["item"]["id"] if kind == "insert" else op.get("id")
+        old = self.items.get(item_id)
+        if old is not None and self.index is not None:
+            self.index.remove(old)
+        if kind == "insert":
+            self.items[item_id] = op["item"]
+        elif kind == "update" and old is not None:
+            old.update(op["fields"])
+            for key in op.get("remove", ()):
+                old.pop(key, None)
+        elif kind == "append" and old is not None:
+            old.setdefault(op["key"], []).append(op["value"])
+        elif kind == "delete":
+            self.items.pop(item_id, None)
+        item = self.items.get(item_id)
+        if item is not None and self.index is not None:
+            self.index.add(item)
+
+    def _read_log(self, start):
+        """Complete log entries from byte `start` on, and where they end."""
+        try:
+            with open(self.wal_path, "rb") as f:
+                f.seek(start)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], start
+        end = chunk.rfind(b"\n") + 1
+        entries = []
+        for line in chunk[:end].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # torn by a crash mid-append
+        return entries, start + end
+
+    def _sync(self):
+        """Catch up with changes made by other processes (or on first use)."""
+        file_key, wal_key = _stat_key(self.path), _stat_key(self.wal_path)
+        if self.items is not None and file_key == self.file_key and wal_key == self.wal_key:
+            return
+        if (self.items is not None and file_key == self.file_key and wal_key is not None
+                and (self.wal_key is None or wal_key[0] == self.wal_key[0]) and wal_key[1] >= self.offset):
+            # Only appended to: apply the new entries
+            entries, self.offset = self._read_log(self.offset)
+            for entry in entries:
+                if "op" in entry:
+                    self._apply(entry)
+                    self.pending += 1
+            self.wal_key = wal_key
+            return
+        with self._file_lock(exclusive=False):
+            file_key, wal_key = _stat_key(self.path), _stat_key(self.wal_path)
+            items = []
+            if file_key:
+                with open(self.path, "r") as f:
+                    items = json.load(f)
+            self.items = {item["id"]: item for item in items}
+            if self.index is not None:
+                self.index.clear()
+                for item in self.items.values():
+                    self.index.add(item)
+            entries, self.offset = self._read_log(0)
+            ops = []
+            for entry in entries:
+                if "compacted" in entry:
+                    if file_key and entry["compacted"] == file_key[0]:
+                        ops = []  # everything logged so far is in the file
+                elif "op" in entry:
+                    ops.append(entry)
+            for op in ops:
+                self._apply(op)
+            self.pending = len(ops)
+            self.file_key, self.wal_key = file_key, wal_key
+
+    def _log(self, op, item_id):
+        line = json.dumps(op, separators=(",", ":")).encode() + b"\n"
+        with open(self.wal_path, "ab") as f:
+            if f.tell() > self.offset:
+                # Don't run on from a line torn by a crash
+                line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._sync()
+        item = self.items.get(item_id)
+        if self.pending >= STORE_COMPACT_EVERY:
+            self.compact()
+        return dict(item) if item is not None else None
+
+    def compact(self):
+        """Write the working set to the JSON file and start a new log."""
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(list(self.items.values()), f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.wal_path, "ab") as f:
+                f.write(json.dumps({"compacted": os.stat(tmp).st_ino}).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            tmp_wal = f"{self.wal_path}.{os.getpid()}.tmp"
+            open(tmp_wal, "wb").close()
+            os.replace(tmp_wal, self.wal_path)
+            _fsync_dir(self.path)
+            self.file_key, self.wal_key = _stat_key(self.path), _stat_key(self.wal_path)
+            self.offset = 0
+            self.pending = 0
 
 
 # --- Sprint Board API ---
 SPRINTS_FILE = os.path.join(os.path.dirname(__file__), "sprints.json")
 
 
-def _load_sprints():
-    if not os.path.exists(SPRINTS_FILE):
-        return []
-    with open(SPRINTS_FILE, "r") as f:
-        return json.load(f)
+class _TaskIndex:
+    """Task counts kept up to date as tasks change, for goals and the leaderboard."""
+
+    def __init__(self):
+        self.clear()
 
+    def clear(self):
+        self.goal = collections.Counter()
+        self.goal_done = collections.Counter()
+        self.assignee = collections.Counter()
+        self.status = collections.Counter()
+        self.assignee_status = collections.Counter()
+        self.logs = collections.Counter()
+        self.comments = collections.Counter()
 
-def _save_sprints(data):
-    with open(SPRINTS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    def add(self, task, sign=1):
+        goal, assignee, status = task.get("goalId"), task.get("assignee"), task.get("status")
+        self.goal[goal] += sign
+        if status == "done":
+            self.goal_done[goal] += sign
+        self.assignee[assignee] += sign
+        self.status[status] += sign
+        self.assignee_status[assignee, status] += sign
+        self.logs[assignee] += sign * task.get("logCount", 0)
+        self.comments[assignee] += sign * task.get("commentCount", 0)
+
+    def remove(self, task):
+        self.add(task, -1)
+
+
+_sprints = _JsonStore(SPRINTS_FILE, _TaskIndex())
+
+
+def _load_sprints():
+    return _sprints.all()
+
+
+# --- Task comments and work logs ---
+# Comments and log entries are kept out of sprints.json, in one append-only
+# JSON lines file per task and kind under TASK_NOTES_DIR, so board loads and
+# task updates don't carry them around. Task records only keep the count and
+# the latest entry of each (commentCount/lastComment, logCount/lastLog).
+#
+# Appends to a task's file hold an flock on it, which also serialises the
+# count updates; the file is the source for pages of entries. The store
+# change is journaled before a notes file is written or removed, and files
+# left behind by a delete that didn't get that far are removed on startup.
+TASK_NOTES_DIR = os.environ.get("TASK_NOTES_DIR", os.path.join(os.path.dirname(__file__), "sprint_notes"))
+NOTES_PAGE_SIZE = 50
+_NOTE_FIELDS = {"comments": ("commentCount", "lastComment"), "log": ("logCount", "lastLog")}
+os.makedirs(TASK_NOTES_DIR, exist_ok=True)
+
+
+def _notes_path(task_id, kind):
+    return os.path.join(TASK_NOTES_DIR, f"{task_id}.{kind}.jsonl")
+
+
+@contextlib.contextmanager
+def _locked_notes(task_id, kind):
+    """The task's notes file, open for appending under an exclusive flock.
+
+    The file is removed again on the way out if nothing was written to it.
+    """
+    path = _notes_path(task_id, kind)
+    while True:
+        f = open(path, "a+b")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if os.fstat(f.fileno()).st_nlink:
+            break
+        f.close()  # removed along with its task while we waited
+    try:
+        yield f
+    finally:
+        st = os.fstat(f.fileno())
+        if st.st_nlink and not st.st_size:
+            os.unlink(path)
+        f.close()
+
+
+def _write_notes(f, entries):
+    data = b"".join(json.dumps(e, separators=(",", ":")).encode() + b"\n" for e in entries)
+    end = f.seek(0, 2)
+    if end:
+        f.seek(end - 1)
+        if f.read(1) != b"\n":
+            # Don't run on from a line torn by a crash
+            data = b"\n" + data
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _append_note(task_id, kind, entry):
+    """Append `entry` to a task's comments or log; returns the updated task, or None."""
+    count_key, last_key = _NOTE_FIELDS[kind]
+    with _locked_notes(task_id, kind) as f:
+        task = _sprints.get(task_id)
+        if task is None:
+            return None
+        task = _sprints.update(task_id, {count_key: task.get(count_key, 0) + 1, last_key: entry})
+        _write_notes(f, [entry])
+        return task
+
+
+def _read_notes(task_id, kind, offset, limit):
+    """Up to `limit` entries from `offset` on, or the last `limit` if offset is None."""
+    path = _notes_path(task_id, kind)
+    try:
+        if offset is None:
+            lines = list(itertools.islice(transcripts.iter_reverse(path), limit))[::-1]
+        else:
+            lines = list(itertools.islice(transcripts.iter_forward(path), offset, offset + limit))
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def _delete_task(task_id):
+    """Delete a task together with its comments and log."""
+    with _locked_notes(task_id, "comments"), _locked_notes(task_id, "log"):
+        _sprints.delete(task_id)
+        for kind in _NOTE_FIELDS:
+            os.unlink(_notes_path(task_id, kind))
+
+
+def _migrate_notes():
+    """Move comments and logs still embedded in task records to their own files."""
+    for task in _load_sprints():
+        for kind, (count_key, last_key) in _NOTE_FIELDS.items():
+            if not isinstance(task.get(kind), list):
+                continue
+            with _locked_notes(task["id"], kind) as f:
+                current = _sprints.get(task["id"])
+                if current is None or not isinstance(current.get(kind), list):
+                    continue  # another worker got there first
+                entries = current[kind]
+                f.truncate(0)
+                _write_notes(f, entries)
+                _sprints.update(task["id"], {count_key: len(entries), last_key: entries[-1] if entries else None}, remove=(kind,))
+
+
+def _prune_notes():
+    """Remove notes files whose task is gone, finishing an interrupted delete."""
+    for name in os.listdir(TASK_NOTES_DIR):
+        task_id, _, kind = name.removesuffix(".jsonl").partition(".")
+        if not task_id.isdigit() or kind not in _NOTE_FIELDS:
+            continue
+        # Tasks are journaled before their notes are written, so this can't
+        # catch a task that another worker is still creating
+        with _locked_notes(int(task_id), kind):
+            if _sprints.get(int(task_id)) is None:
+                os.unlink(_notes_path(int(task_id), kind))
+
+
+_migrate_notes()
+_prune_notes()
+
+
+def _notes_page(task_id, kind, **extra):
+    """JSON response with a page of a task's comments or log, per the request's paging args.
+
+    `limit` sets the page size and `offset` the index of the first entry;
+    without an offset the newest page is returned. Entries are oldest first.
+    """
+    task = _sprints.get(task_id)
+    if task is None:
+        abort(404)
+    try:
+        limit = min(max(int(request.args.get("limit", NOTES_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        offset = int(request.args["offset"]) if request.args.get("offset") else None
+    except ValueError:
+        abort(400)
+    if offset is not None and offset < 0:
+        abort(400)
+    total = task.get(_NOTE_FIELDS[kind][0], 0)
+    entries = _read_notes(task_id, kind, offset, limit)
+    return jsonify({
+        kind: entries,
+        "offset": max(total - len(entries), 0) if offset is None else offset,
+        "total": total,
+        **extra,
+    })
 
 
 @app.route("/api/sprints", methods=["GET"])
 @login_required
+@conditional(_sprints.fingerprint)
 def api_sprints_get():
     return jsonify({"tasks": _load_sprints()})
 
@@ -268,18 +2086,13 @@ def api_sprints_get():
 @login_required
 def api_sprints_create():
     body = request.get_json(force=True)
-    tasks = _load_sprints()
-    new_id = max((t["id"] for t in tasks), default=0) + 1
-    task = {
-        "id": new_id,
+    task = _sprints.insert({
         "title": body.get("title", "Untitled"),
         "description": body.get("description", ""),
         "assignee": body.get("assignee", "richard"),
         "status": body.get("status", "backlog"),
         "created": datetime.now(timezone.utc).isoformat(),
-    }
-    tasks.append(task)
-    _save_sprints(tasks)
+    })
     return jsonify(task), 201
 
 
@@ -287,25 +2100,16 @@ def api_sprints_create():
 @login_required
 def api_sprints_update(task_id):
     body = request.get_json(force=True)
-    tasks = _load_sprints()
-    for t in tasks:
-        if t["id"] == task_id:
-            for k in ("title", "description", "assignee", "status", "goalId"):
-                if k in body:
-                    t[k] = body[k]
-            _save_sprints(tasks)
-            return jsonify(t)
-    abort(404)
+    task = _sprints.update(task_id, {k: body[k] for k in ("title", "description", "assignee", "status", "goalId") if k in body})
+    if task is None:
+        abort(404)
+    return jsonify(task)
 
 
 @app.route("/api/sprints/<int:task_id>/comments", methods=["GET"])
 @login_required
 def api_sprints_get_comments(task_id):
-    tasks = _load_sprints()
-    for t in tasks:
-        if t["id"] == task_id:
-            return jsonify({"comments": t.get("comments", [])})
-    abort(404)
+    return _notes_page(task_id, "comments")
 
 
 @app.route("/api/sprints/<int:task_id>/comments", methods=["POST"])
@@ -316,19 +2120,14 @@ def api_sprints_add_comment(task_id):
     author = body.get("author", "You").strip()
     if not text:
         abort(400)
-    tasks = _load_sprints()
-    for t in tasks:
-        if t["id"] == task_id:
-            if "comments" not in t:
-                t["comments"] = []
-            t["comments"].append({
-                "author": author,
-                "text": text,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            })
-            _save_sprints(tasks)
-            return jsonify({"ok": True, "comments": t["comments"]})
-    abort(404)
+    task = _append_note(task_id, "comments", {
+        "author": author,
+        "text": text,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    })
+    if task is None:
+        abort(404)
+    return _notes_page(task_id, "comments", ok=True)
 
 
 @app.route("/api/sprints/<int:task_id>/log", methods=["POST"])
@@ -338,69 +2137,199 @@ def api_sprints_add_log(task_id):
     entry = body.get("entry", "").strip()
     if not entry:
         abort(400)
-    tasks = _load_sprints()
-    for t in tasks:
-        if t["id"] == task_id:
-            if "log" not in t:
-                t["log"] = []
-            t["log"].append(entry)
-            _save_sprints(tasks)
-            return jsonify({"ok": True, "log": t["log"]})
-    abort(404)
+    task = _append_note(task_id, "log", entry)
+    if task is None:
+        abort(404)
+    return _notes_page(task_id, "log", ok=True)
+
+
+@app.route("/api/sprints/<int:task_id>/log", methods=["GET"])
+@login_required
+def api_sprints_get_log(task_id):
+    return _notes_page(task_id, "log")
 
 
 @app.route("/api/sprints/<int:task_id>", methods=["DELETE"])
 @login_required
 def api_sprints_delete(task_id):
-    tasks = _load_sprints()
-    tasks = [t for t in tasks if t["id"] != task_id]
-    _save_sprints(tasks)
+    _delete_task(task_id)
     return jsonify({"ok": True})
 
 
+# --- Batch task operations ---
+# /api/sprints/batch applies a list of operations to the board as one
+# change: all of them are checked against working copies of the tasks
+# first, and only if every one is valid are their comments and log entries
+# written and the task changes logged as a single store entry.
+MAX_BATCH_SIZE = 1000
+_BATCH_NOTES = {"comment": "comments", "log": "log"}
+
+
+def _batch_notes(operations):
+    """The (task id, kind) notes files a batch touches, in locking order."""
+    keys = set()
+    for o in operations:
+        if not isinstance(o.get("id"), int):
+            continue
+        if o.get("op") in _BATCH_NOTES:
+            keys.add((o["id"], _BATCH_NOTES[o["op"]]))
+        elif o.get("op") == "delete":
+            keys.update((o["id"], kind) for kind in _NOTE_FIELDS)
+    return sorted(keys)
+
+
+def _sprint_batch(operations):
+    """Apply task operations in order, all or none. Returns (ok, results)."""
+    with contextlib.ExitStack() as stack:
+        # Notes files before the store, like _append_note and _delete_task
+        files = {key: stack.enter_context(_locked_notes(*key)) for key in _batch_notes(operations)}
+        stack.enter_context(_sprints.locked())
+        tasks = {}  # id -> working copy, None once deleted
+        changes, notes, removed, results = [], {}, set(), []
+        next_id = _sprints.next_id()
+
+        def task(task_id):
+            if not isinstance(task_id, int):
+                return None
+            if task_id not in tasks:
+                tasks[task_id] = _sprints.get(task_id)
+            return tasks[task_id]
+
+        for o in operations:
+            op, task_id = o.get("op"), o.get("id")
+            if op == "create":
+                t = {
+                    "id": next_id,
+                    "title": o.get("title", "Untitled"),
+                    "description": o.get("description", ""),
+                    "assignee": o.get("assignee", "richard"),
+                    "status": o.get("status", "backlog"),
+                    "created": datetime.now(timezone.utc).isoformat(),
+                }
+                next_id += 1
+                tasks[t["id"]] = t
+                changes.append(("insert", dict(t)))
+                results.append({"ok": True, "task": dict(t)})
+            elif op == "update":
+                t = task(task_id)
+                if t is None:
+                    results.append({"ok": False, "error": "not found"})
+                    continue
+                fields = {k: o[k] for k in ("title", "description", "assignee", "status", "goalId") if k in o}
+                t.update(fields)
+                changes.append(("update", task_id, fields))
+                results.append({"ok": True, "task": dict(t)})
+            elif op == "delete":
+                if isinstance(task_id, int):
+                    removed.add(task_id)
+                if task(task_id) is not None:
+                    tasks[task_id] = None
+                    changes.append(("delete", task_id))
+                results.append({"ok": True})
+            elif op in _BATCH_NOTES:
+                kind = _BATCH_NOTES[op]
+                text = (o.get("text") if op == "comment" else o.get("entry")) or ""
+                if not isinstance(text, str) or not text.strip():
+                    results.append({"ok": False, "error": "empty"})
+                    continue
+                t = task(task_id)
+                if t is None:
+                    results.append({"ok": False, "error": "not found"})
+                    continue
+                if op == "comment":
+                    entry = {
+                        "author": str(o.get("author", "You")).strip(),
+                        "text": text.strip(),
+                        "timestamp": datetime.now(timezone.utc).isoformat(),
+                    }
+                else:
+                    entry = text.strip()
+                count_key, last_key = _NOTE_FIELDS[kind]
+                fields = {count_key: t.get(count_key, 0) + 1, last_key: entry}
+                t.update(fields)
+                notes.setdefault((task_id, kind), []).append(entry)
+                changes.append(("update", task_id, fields))
+                results.append({"ok": True, "task": dict(t)})
+            else:
+                results.append({"ok": False, "error": "unknown op"})
+
+        if not all(r["ok"] for r in results):
+            return False, results
+        _sprints.batch(changes)
+        for key, entries in notes.items():
+            _write_notes(files[key], entries)
+        for task_id in removed:
+            for kind in _NOTE_FIELDS:
+                os.unlink(_notes_path(task_id, kind))
+        return True, results
+
+
+@app.route("/api/sprints/batch", methods=["POST"])
+@login_required
+def api_sprints_batch():
+    """Apply {"ops": [...]} to the board in one go.
+
+    Each operation has an "op" (create, update, delete, comment or log),
+    the task "id" unless it creates one, and the same fields as the
+    single-task endpoints. Returns one result per operation; if any is
+    invalid nothing is applied and the response is a 400.
+    """
+    body = request.get_json(force=True)
+    operations = body.get("ops") if isinstance(body, dict) else None
+    if (not isinstance(operations, list) or len(operations) > MAX_BATCH_SIZE
+            or not all(isinstance(o, dict) for o in operations)):
+        abort(400)
+    ok, results = _sprint_batch(operations)
+    return jsonify({"ok": ok, "results": results}), 200 if ok else 400
+
+
+MAX_PAGE_SIZE = 1000
+
+
 @app.route("/api/messages")
 @login_required
 def api_messages():
+    """Message feed, newest first.
+
+    `limit` sets the page size; `before`/`after` take the `next`/`prev`
+    cursors of a previous page to walk back or forward through history.
+    """
     agent_filter = request.args.get("agent", "")
     role_filter = request.args.get("role", "")
-    limit = int(request.args.get("limit", 100))
-    all_msgs = []
-    agents = [agent_filter] if agent_filter and agent_filter in AGENT_NAMES else AGENT_NAMES
-    for agent_name in agents:
-        for m in parse_sessions(agent_name):
-            if m.get("content_preview") and m.get("role") in ("user", "assistant"):
-                if role_filter and m["role"] != role_filter:
-                    continue
-                all_msgs.append({**m, "agent": agent_name})
-    all_msgs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    return jsonify({"messages": all_msgs[:limit]})
+    try:
+        limit = min(max(int(request.args.get("limit", 100)), 1), MAX_PAGE_SIZE)
+        before = decode_cursor(request.args["before"]) if request.args.get("before") else None
+        after = decode_cursor(request.args["after"]) if request.args.get("after") else None
+    except ValueError:
+        abort(400)
+    snap = current_snapshot()
+    if before is None and after is None:
+        msgs = snap.messages(agent_filter, role_filter, limit)
+    else:
+        msgs = build_messages(agent_filter, role_filter, limit, before, after)
+    return jsonify({
+        "messages": msgs,
+        "next": encode_cursor(msgs[-1]) if msgs and (len(msgs) == limit or after is not None) else None,
+        "prev": encode_cursor(msgs[0]) if msgs else request.args.get("after") or None,
+    })
 
 
 GOALS_FILE = os.path.join(os.path.dirname(__file__), "goals.json")
+_goals = _JsonStore(GOALS_FILE)
 
 
 def _load_goals():
-    if not os.path.exists(GOALS_FILE):
-        return []
-    with open(GOALS_FILE, "r") as f:
-        return json.load(f)
-
-
-def _save_goals(data):
-    with open(GOALS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    return _goals.all()
 
 
 @app.route("/api/goals", methods=["GET"])
 @login_required
+@conditional(lambda: (_goals.fingerprint(), _sprints.fingerprint()))
 def api_goals_get():
     goals = _load_goals()
-    tasks = _load_sprints()
     # Enrich goals with progress from linked tasks
-    for g in goals:
-        linked = [t for t in tasks if t.get("goalId") == g["id"]]
-        total = len(linked)
-        done = len([t for t in linked if t.get("status") == "done"])
+    counts = _sprints.query(lambda index: [(index.goal[g["id"]], index.goal_done[g["id"]]) for g in goals])
+    for g, (total, done) in zip(goals, counts):
         g["linkedTasks"] = total
         g["completedTasks"] = done
         g["progress"] = round((done / total * 100) if total > 0 else 0)
@@ -411,19 +2340,14 @@ def api_goals_get():
 @login_required
 def api_goals_create():
     body = request.get_json(force=True)
-    goals = _load_goals()
-    new_id = max((g["id"] for g in goals), default=0) + 1
-    goal = {
-        "id": new_id,
+    goal = _goals.insert({
         "title": body.get("title", "Untitled"),
         "description": body.get("description", ""),
         "owner": body.get("owner", "richard"),
         "deadline": body.get("deadline", ""),
         "status": body.get("status", "active"),
         "created": datetime.now(timezone.utc).isoformat(),
-    }
-    goals.append(goal)
-    _save_goals(goals)
+    })
     return jsonify(goal), 201
 
 
@@ -431,56 +2355,61 @@ def api_goals_create():
 @login_required
 def api_goals_update(goal_id):
     body = request.get_json(force=True)
-    goals = _load_goals()
-    for g in goals:
-        if g["id"] == goal_id:
-            for k in ("title", "description", "owner", "deadline", "status"):
-                if k in body:
-                    g[k] = body[k]
-            _save_goals(goals)
-            return jsonify(g)
-    abort(404)
+    goal = _goals.update(goal_id, {k: body[k] for k in ("title", "description", "owner", "deadline", "status") if k in body})
+    if goal is None:
+        abort(404)
+    return jsonify(goal)
 
 
 @app.route("/api/goals/<int:goal_id>", methods=["DELETE"])
 @login_required
 def api_goals_delete(goal_id):
-    goals = _load_goals()
-    goals = [g for g in goals if g["id"] != goal_id]
-    _save_goals(goals)
+    _goals.delete(goal_id)
     return jsonify({"ok": True})
 
 
 @app.route("/api/leaderboard", methods=["GET"])
 @login_required
+@conditional(lambda: (_snapshot_validator(), _sprints.fingerprint()))
 def api_leaderboard():
-    tasks = _load_sprints()
+    snap = current_snapshot()
+    key = ("leaderboard", snap.generation, _sprints.fingerprint())
+    return jsonify({"leaderboard": _single_flight.do(key, lambda: build_leaderboard(snap))})
+
+
+def build_leaderboard(snap):
+    def counts(index):
+        return {name: (
+            index.assignee_status[name, "done"],
+            index.assignee_status[name, "in-progress"],
+            index.assignee_status[name, "blocked"],
+            index.assignee_status[name, "backlog"],
+            index.assignee[name],
+            index.logs[name],
+            index.comments[name],
+        ) for name in AGENT_NAMES}
+
+    task_counts = _sprints.query(counts)
     agents_data = {}
     for name in AGENT_NAMES:
-        agent_tasks = [t for t in tasks if t.get("assignee") == name]
-        done = [t for t in agent_tasks if t.get("status") == "done"]
-        in_prog = [t for t in agent_tasks if t.get("status") == "in-progress"]
-        blocked = [t for t in agent_tasks if t.get("status") == "blocked"]
-        backlog = [t for t in agent_tasks if t.get("status") == "backlog"]
-        total_logs = sum(len(t.get("log", [])) for t in agent_tasks)
-        total_comments = sum(len(t.get("comments", [])) for t in agent_tasks)
+        done, in_prog, blocked, backlog, total_tasks, total_logs, total_comments = task_counts[name]
         # Score: done*10 + in_progress*3 + logs*2 + comments*1 - blocked*5
-        score = len(done) * 10 + len(in_prog) * 3 + total_logs * 2 + total_comments - len(blocked) * 5
-        stats = build_agent_stats(name)
+        score = done * 10 + in_prog * 3 + total_logs * 2 + total_comments - blocked * 5
+        stats = snap.by_agent[name]
         agents_data[name] = {
             "agent": name,
-            "done": len(done),
-            "inProgress": len(in_prog),
-            "blocked": len(blocked),
-            "backlog": len(backlog),
-            "totalTasks": len(agent_tasks),
+            "done": done,
+            "inProgress": in_prog,
+            "blocked": blocked,
+            "backlog": backlog,
+            "totalTasks": total_tasks,
             "logEntries": total_logs,
             "comments": total_comments,
             "score": max(score, 0),
             "humanEquivHours": stats.get("humanEquivHours", 0),
             "activeHours": stats.get("activeHours", 0),
             "totalCost": stats.get("totalCost", 0),
-            "status": "shipping" if len(done) > len(in_prog) else ("grinding" if len(in_prog) > 0 else ("blocked" if len(blocked) > 0 else "idle")),
+            "status": "shipping" if done > in_prog else ("grinding" if in_prog > 0 else ("blocked" if blocked > 0 else "idle")),
         }
     ranked = sorted(agents_data.values(), key=lambda x: x["score"], reverse=True)
     for i, r in enumerate(ranked):
@@ -493,30 +2422,184 @@ def api_leaderboard():
             r["badge"] = "🥉"
         else:
             r["badge"] = ""
-    return jsonify({"leaderboard": ranked})
+    return ranked
 
 
 DOCS_DIR = os.path.join(os.path.dirname(__file__), "docs")
 DOCS_FILE = os.path.join(os.path.dirname(__file__), "docs_meta.json")
 os.makedirs(DOCS_DIR, exist_ok=True)
 
+# docs_meta.json only holds doc metadata and a short excerpt for the list
+# view; each body lives in DOCS_DIR/<id>.md, written before the metadata
+# change that refers to it is logged.
+DOC_EXCERPT_LENGTH = 200
+
+
+def _doc_path(doc_id):
+    return os.path.join(DOCS_DIR, f"{doc_id}.md")
+
+
+def _read_doc_body(doc_id):
+    try:
+        with open(_doc_path(doc_id), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def _write_doc_body(doc_id, content):
+    path = _doc_path(doc_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# Full-text search: an inverted index over doc titles, tags, categories and
+# content, kept up to date by the docs store like the sprint task index.
+# Matches are ranked with BM25, title and tag hits counting for more; the
+# last word of a query also matches as a prefix, for search-as-you-type.
+SEARCH_FIELDS = (("title", 3), ("tags", 3), ("category", 2), ("content", 1))
+SEARCH_PAGE_SIZE = 20
+# A short prefix can match much of the vocabulary; only this many of its
+# terms are searched.
+SEARCH_PREFIX_TERMS = 50
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class _DocIndex:
+    """Inverted index over the docs, for /api/docs/search."""
+
+    K1, B = 1.2, 0.75
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.postings = {}  # term -> {doc id: weighted term frequency}
+        self.terms = []  # sorted vocabulary, for prefix matches
+        self.docs = {}  # doc id -> record
+        self.doc_terms = {}  # doc id -> {term: weighted term frequency}
+        self.lengths = {}  # doc id -> weighted number of words
+        self.total_length = 0
+
+    def add(self, doc):
+        tf = collections.Counter()
+        for field, weight in SEARCH_FIELDS:
+            value = doc.get(field)
+            if field == "content" and field not in doc:
+                value = _read_doc_body(doc["id"])
+            if isinstance(value, list):
+                value = " ".join(v for v in value if isinstance(v, str))
+            if isinstance(value, str):
+                for word in _words(value):
+                    tf[word] += weight
+        for term, n in tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+            posting[doc["id"]] = n
+        self.docs[doc["id"]] = doc
+        self.doc_terms[doc["id"]] = tf
+        self.lengths[doc["id"]] = sum(tf.values())
+        self.total_length += self.lengths[doc["id"]]
+
+    def remove(self, doc):
+        tf = self.doc_terms.pop(doc["id"])
+        del self.docs[doc["id"]]
+        self.total_length -= self.lengths.pop(doc["id"])
+        for term in tf:
+            posting = self.postings[term]
+            del posting[doc["id"]]
+            if not posting:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self.terms, prefix)
+        return itertools.takewhile(lambda term: term.startswith(prefix), self.terms[i:i + SEARCH_PREFIX_TERMS])
+
+    def search(self, query, limit, match=None):
+        """The best `limit` (score, doc id) matches for `query`, and how many docs match.
+
+        Every word has to match; `match(doc)` can filter docs further.
+        """
+        words = _words(query)
+        if not words or not self.docs:
+            return [], 0
+        n, avg_length = len(self.docs), self.total_length / len(self.docs) or 1
+        matched = None
+        for i, word in enumerate(words):
+            terms = self._expand(word) if i == len(words) - 1 else [word] if word in self.postings else []
+            scores = {}
+            for term in terms:
+                posting = self.postings[term]
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = 1 - self.B + self.B * self.lengths[doc_id] / avg_length
+                    score = idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+                    if score > scores.get(doc_id, 0):
+                        scores[doc_id] = score
+            matched = scores if matched is None else {d: matched[d] + sc for d, sc in scores.items() if d in matched}
+            if not matched:
+                return [], 0
+        hits = [(score, doc_id) for doc_id, score in matched.items() if match is None or match(self.docs[doc_id])]
+        return heapq.nlargest(limit, hits), len(hits)
+
+
+def _snippet(text, words, width=200):
+    """A stretch of `text` around the first word starting with one of `words`."""
+    m = re.search(r"\b(?:%s)" % "|".join(map(re.escape, words)), text, re.IGNORECASE)
+    start = max(m.start() - width // 4, 0) if m else 0
+    snippet = " ".join(text[start:start + width].split())
+    return ("…" if start else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+_docs = _JsonStore(DOCS_FILE, _DocIndex())
+
 
 def _load_docs():
-    if not os.path.exists(DOCS_FILE):
-        return []
-    with open(DOCS_FILE, "r") as f:
-        return json.load(f)
+    return _docs.all()
+
 
+def _migrate_docs():
+    """Move doc bodies still kept in docs_meta.json to their own files."""
+    with _docs.locked():
+        for doc in _load_docs():
+            if "content" in doc:
+                content = doc["content"] if isinstance(doc["content"], str) else ""
+                _write_doc_body(doc["id"], content)
+                _docs.update(doc["id"], {"excerpt": content[:DOC_EXCERPT_LENGTH]}, remove=("content",))
 
-def _save_docs(data):
-    with open(DOCS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+
+_migrate_docs()
+
+
+def _doc_content(body):
+    content = body.get("content", "")
+    if not isinstance(content, str):
+        abort(400)
+    return content
 
 
 @app.route("/api/docs", methods=["GET"])
 @login_required
+@conditional(_docs.fingerprint)
 def api_docs_list():
+    """Doc metadata, without bodies.
+
+    `fields` takes a comma-separated list of the keys to return per doc.
+    """
     docs = _load_docs()
+    if request.args.get("fields"):
+        keys = request.args["fields"].split(",")
+        docs = [{k: doc[k] for k in keys if k in doc} for doc in docs]
     return jsonify({"docs": docs})
 
 
@@ -524,56 +2607,97 @@ def api_docs_list():
 @login_required
 def api_docs_create():
     body = request.get_json(force=True)
-    docs = _load_docs()
-    new_id = max((d["id"] for d in docs), default=0) + 1
-    doc = {
-        "id": new_id,
-        "title": body.get("title", "Untitled"),
-        "category": body.get("category", "general"),
-        "content": body.get("content", ""),
-        "author": body.get("author", "richard"),
-        "tags": body.get("tags", []),
-        "audience": body.get("audience", "all"),  # human, ai, all
-        "created": datetime.now(timezone.utc).isoformat(),
-        "updated": datetime.now(timezone.utc).isoformat(),
-    }
-    docs.append(doc)
-    _save_docs(docs)
+    content = _doc_content(body)
+    with _docs.locked():
+        doc_id = _docs.next_id()
+        _write_doc_body(doc_id, content)
+        doc = _docs.insert({
+            "title": body.get("title", "Untitled"),
+            "category": body.get("category", "general"),
+            "excerpt": content[:DOC_EXCERPT_LENGTH],
+            "author": body.get("author", "richard"),
+            "tags": body.get("tags", []),
+            "audience": body.get("audience", "all"),  # human, ai, all
+            "created": datetime.now(timezone.utc).isoformat(),
+            "updated": datetime.now(timezone.utc).isoformat(),
+        })
+    doc["content"] = content
     return jsonify(doc), 201
 
 
+@app.route("/api/docs/search", methods=["GET"])
+@login_required
+@conditional(_docs.fingerprint)
+def api_docs_search():
+    """Ranked full-text search over the docs.
+
+    `q` is the query; `tag`, `category` and `audience` restrict the docs
+    searched and `limit` caps the number of results. Each result is the
+    doc's metadata with its `score` and a content `snippet`.
+    """
+    query = request.args.get("q", "")
+    tag = request.args.get("tag", "")
+    category = request.args.get("category", "")
+    audience = request.args.get("audience", "")
+    try:
+        limit = min(max(int(request.args.get("limit", SEARCH_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400)
+
+    def match(doc):
+        return ((not tag or tag in (doc.get("tags") or []))
+                and (not category or doc.get("category") == category)
+                and (not audience or doc.get("audience") == audience))
+
+    def search(index):
+        hits, total = index.search(query, limit, match)
+        results = []
+        for score, doc_id in hits:
+            doc = dict(index.docs[doc_id])
+            doc["score"] = round(score, 4)
+            doc["snippet"] = _snippet(_read_doc_body(doc_id), _words(query))
+            results.append(doc)
+        return results, total
+
+    results, total = _docs.query(search)
+    return jsonify({"results": results, "total": total})
+
+
 @app.route("/api/docs/<int:doc_id>", methods=["GET"])
 @login_required
 def api_docs_get(doc_id):
-    docs = _load_docs()
-    for d in docs:
-        if d["id"] == doc_id:
-            return jsonify(d)
-    abort(404)
+    doc = _docs.get(doc_id)
+    if doc is None:
+        abort(404)
+    doc["content"] = _read_doc_body(doc_id)
+    return jsonify(doc)
 
 
 @app.route("/api/docs/<int:doc_id>", methods=["PUT"])
 @login_required
 def api_docs_update(doc_id):
     body = request.get_json(force=True)
-    docs = _load_docs()
-    for d in docs:
-        if d["id"] == doc_id:
-            for k in ("title", "category", "content", "author", "tags", "audience"):
-                if k in body:
-                    d[k] = body[k]
-            d["updated"] = datetime.now(timezone.utc).isoformat()
-            _save_docs(docs)
-            return jsonify(d)
-    abort(404)
+    fields = {k: body[k] for k in ("title", "category", "author", "tags", "audience") if k in body}
+    fields["updated"] = datetime.now(timezone.utc).isoformat()
+    content = _doc_content(body) if "content" in body else None
+    with _docs.locked():
+        if _docs.get(doc_id) is None:
+            abort(404)
+        if content is not None:
+            _write_doc_body(doc_id, content)
+            fields["excerpt"] = content[:DOC_EXCERPT_LENGTH]
+        doc = _docs.update(doc_id, fields)
+        doc["content"] = _read_doc_body(doc_id) if content is None else content
+    return jsonify(doc)
 
 
 @app.route("/api/docs/<int:doc_id>", methods=["DELETE"])
 @login_required
 def api_docs_delete(doc_id):
-    docs = _load_docs()
-    docs = [d for d in docs if d["id"] != doc_id]
-    _save_docs(docs)
+    with _docs.locked():
+        _docs.delete(doc_id)
+        if os.path.exists(_doc_path(doc_id)):
+            os.unlink(_doc_path(doc_id))
     return jsonify({"ok": True})
 
 
@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 """Pied Piper Live Dashboard Server — serves HTML + /api/data from JSONL transcripts."""
 
-import json, glob, os, time, datetime, html, base64, secrets, hashlib
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import json, glob, gzip, heapq, os, time, datetime, html, base64, secrets, hashlib, threading, shutil
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from http.cookies import SimpleCookie
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
 from urllib.parse import parse_qs
 
+from transcripts import decode, iter_reverse, record_type
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
 AGENTS_DIR = os.path.expanduser("~/.openclaw/agents")
 CRON_DIR = os.path.expanduser("~/.openclaw/cron/runs")
 DASHBOARD_DIR = Path(__file__).parent
@@ -28,10 +38,135 @@ def parse_channel(key: str) -> str:
             return tag
     return "unknown"
 
+# AGGREGATE_EXECUTOR: "serial" (default), "thread" or "process". Transcript
+# files of all agents are decoded on AGGREGATE_WORKERS workers and merged back
+# in agent/file order, so every mode returns exactly the serial result.
+AGGREGATE_EXECUTOR = os.environ.get("AGGREGATE_EXECUTOR", "serial")
+AGGREGATE_WORKERS = int(os.environ.get("AGGREGATE_WORKERS", 0)) or os.cpu_count() or 1
+_pool = None
+
+def _map(fn, *iterables):
+    global _pool
+    if AGGREGATE_EXECUTOR == "serial":
+        return list(map(fn, *iterables))
+    if _pool is None:
+        cls = ProcessPoolExecutor if AGGREGATE_EXECUTOR == "process" else ThreadPoolExecutor
+        _pool = cls(max_workers=AGGREGATE_WORKERS)
+    return list(_pool.map(fn, *iterables))
+
+def parse_transcript(agent_id, jf):
+    """Decode one JSONL transcript into its own totals, messages and timeline."""
+    part = {"total_input": 0, "total_output": 0, "total_cache_read": 0,
+            "total_cache_write": 0, "total_cost": 0.0, "msg_in": 0, "msg_out": 0,
+            "messages": [], "timeline": [], "model": None, "failed": False}
+    model = None
+    try:
+        with open(jf, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if record_type(line) == "custom" and b"model-snapshot" not in line:
+                    continue
+                entry = decode(line, ("message", "model_change", "custom"))
+                if entry is None:
+                    continue
+
+                etype = entry.get("type", "")
+
+                if etype == "model_change":
+                    model = entry.get("modelId") or entry.get("data", {}).get("modelId")
+
+                if etype == "custom" and entry.get("customType") == "model-snapshot":
+                    d = entry.get("data", {})
+                    if d.get("modelId"):
+                        model = d["modelId"]
+
+                if etype == "message":
+                    msg = entry.get("message", {})
+                    role = msg.get("role", "")
+                    ts = entry.get("timestamp", "")
+                    usage = msg.get("usage", {})
+
+                    if usage:
+                        part["total_input"] += usage.get("input", 0)
+                        part["total_output"] += usage.get("output", 0)
+                        part["total_cache_read"] += usage.get("cacheRead", 0)
+                        part["total_cache_write"] += usage.get("cacheWrite", 0)
+                        part["total_cost"] += usage.get("cost", {}).get("total", 0)
+
+                    if role == "user":
+                        part["msg_in"] += 1
+                    elif role == "assistant":
+                        part["msg_out"] += 1
+
+                    # Extract message content for recent messages
+                    content_text = ""
+                    content = msg.get("content", [])
+                    if isinstance(content, list):
+                        for c in content:
+                            if isinstance(c, dict) and c.get("type") == "text":
+                                content_text = c.get("text", "")[:300]
+                                break
+                    elif isinstance(content, str):
+                        content_text = content[:300]
+
+                    if content_text.strip() and role in ("user", "assistant"):
+                        # Strip system prefixes for cleaner display
+                        preview = content_text.strip()
+                        if preview.startswith("System:"):
+                            # Extract the actual message after metadata
+                            lines = preview.split("\n")
+                            for ln in lines:
+                                ln = ln.strip()
+                                if ln and not ln.startswith("System:") and not ln.startswith("Conversation info") and not ln.startswith("```") and not ln.startswith("Sender") and not ln.startswith("{") and not ln.startswith("Untrusted") and not ln.startswith("<<<"):
+                                    preview = ln
+                                    break
+
+                        part["messages"].append({
+                            "agent": AGENT_NAMES.get(agent_id, agent_id),
+                            "agent_id": agent_id,
+                            "role": role,
+                            "direction": "in" if role == "user" else "out",
+                            "timestamp": ts,
+                            "preview": preview[:150],
+                            "model": msg.get("model", model or ""),
+                        })
+
+                    # Timeline for assistant messages
+                    if role == "assistant" and content_text.strip():
+                        part["timeline"].append({
+                            "agent": AGENT_NAMES.get(agent_id, agent_id),
+                            "agent_id": agent_id,
+                            "timestamp": ts,
+                            "preview": content_text.strip()[:120],
+                            "model": msg.get("model", model or "unknown"),
+                        })
+    except Exception:
+        part["failed"] = True
+    part["model"] = model
+    return part
+
+# Per-file totals that are also summed per session
+SESSION_TOTALS = ("total_input", "total_output", "total_cache_read", "total_cache_write", "msg_in", "msg_out")
+
+
 def aggregate():
     now_ms = int(time.time() * 1000)
     result = {"agents": [], "sessions": [], "timeline": [], "messages": [], "cron_runs": [], "generated_at": datetime.datetime.now().isoformat()}
 
+    agent_files = {}
+    for agent_id in AGENT_IDS:
+        agent_dir = os.path.join(AGENTS_DIR, agent_id, "sessions")
+        agent_files[agent_id] = glob.glob(os.path.join(agent_dir, "*.jsonl"))
+
+    # Fan out per file across every agent, then merge in serial order
+    jobs = [(agent_id, jf) for agent_id in AGENT_IDS for jf in agent_files[agent_id]]
+    parts = dict(zip(jobs, _map(parse_transcript, *zip(*jobs)))) if jobs else {}
+
+    # (agent_id, session_id) -> that session's rows in result["sessions"]
+    session_index = {}
+
     for agent_id in AGENT_IDS:
         agent_dir = os.path.join(AGENTS_DIR, agent_id, "sessions")
         sessions_file = os.path.join(agent_dir, "sessions.json")
@@ -61,114 +196,39 @@ def aggregate():
                 agent_data["last_active"] = updated
             channel = parse_channel(key)
             agent_data["channels"].add(channel.split(":")[0])
-            result["sessions"].append({
+            session = {
                 "agent": AGENT_NAMES.get(agent_id, agent_id), "agent_id": agent_id,
                 "key": key, "channel": channel, "updated_at": updated,
                 "session_id": val.get("sessionId", ""), "tokens": 0,
-            })
+                **{k: 0 for k in SESSION_TOTALS}, "total_cost": 0.0,
+            }
+            result["sessions"].append(session)
+            session_index.setdefault((agent_id, session["session_id"]), []).append(session)
 
         if agent_data["last_active"] > now_ms - 300_000:
             agent_data["status"] = "active"
         elif agent_data["last_active"] > now_ms - 3_600_000:
             agent_data["status"] = "idle"
 
-        # Parse JSONL files
-        jsonl_files = glob.glob(os.path.join(agent_dir, "*.jsonl"))
-        for jf in jsonl_files:
-            model = None
-            try:
-                with open(jf) as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            entry = json.loads(line)
-                        except Exception:
-                            continue
-
-                        etype = entry.get("type", "")
-
-                        if etype == "model_change":
-                            model = entry.get("modelId") or entry.get("data", {}).get("modelId")
-
-                        if etype == "custom" and entry.get("customType") == "model-snapshot":
-                            d = entry.get("data", {})
-                            if d.get("modelId"):
-                                model = d["modelId"]
-
-                        if etype == "message":
-                            msg = entry.get("message", {})
-                            role = msg.get("role", "")
-                            ts = entry.get("timestamp", "")
-                            usage = msg.get("usage", {})
-
-                            if usage:
-                                agent_data["total_input"] += usage.get("input", 0)
-                                agent_data["total_output"] += usage.get("output", 0)
-                                agent_data["total_cache_read"] += usage.get("cacheRead", 0)
-                                agent_data["total_cache_write"] += usage.get("cacheWrite", 0)
-                                agent_data["total_cost"] += usage.get("cost", {}).get("total", 0)
-
-                            if role == "user":
-                                agent_data["msg_in"] += 1
-                            elif role == "assistant":
-                                agent_data["msg_out"] += 1
-
-                            # Extract message content for recent messages
-                            content_text = ""
-                            content = msg.get("content", [])
-                            if isinstance(content, list):
-                                for c in content:
-                                    if isinstance(c, dict) and c.get("type") == "text":
-                                        content_text = c.get("text", "")[:300]
-                                        break
-                            elif isinstance(content, str):
-                                content_text = content[:300]
-
-                            if content_text.strip() and role in ("user", "assistant"):
-                                # Strip system prefixes for cleaner display
-                                preview = content_text.strip()
-                                if preview.startswith("System:"):
-                                    # Extract the actual message after metadata
-                                    lines = preview.split("\n")
-                                    for ln in lines:
-                                        ln = ln.strip()
-                                        if ln and not ln.startswith("System:") and not ln.startswith("Conversation info") and not ln.startswith("```") and not ln.startswith("Sender") and not ln.startswith("{") and not ln.startswith("Untrusted") and not ln.startswith("<<<"):
-                                            preview = ln
-                                            break
-
-                                result["messages"].append({
-                                    "agent": AGENT_NAMES.get(agent_id, agent_id),
-                                    "agent_id": agent_id,
-                                    "role": role,
-                                    "direction": "in" if role == "user" else "out",
-                                    "timestamp": ts,
-                                    "preview": preview[:150],
-                                    "model": msg.get("model", model or ""),
-                                })
-
-                            # Timeline for assistant messages
-                            if role == "assistant" and content_text.strip():
-                                result["timeline"].append({
-                                    "agent": AGENT_NAMES.get(agent_id, agent_id),
-                                    "agent_id": agent_id,
-                                    "timestamp": ts,
-                                    "preview": content_text.strip()[:120],
-                                    "model": msg.get("model", model or "unknown"),
-                                })
-            except Exception:
+        for jf in agent_files[agent_id]:
+            part = parts[(agent_id, jf)]
+            for k in ("total_input", "total_output", "total_cache_read", "total_cache_write", "total_cost", "msg_in", "msg_out"):
+                agent_data[k] += part[k]
+            result["messages"].extend(part["messages"])
+            result["timeline"].extend(part["timeline"])
+            if part["failed"]:
                 continue
 
-            if model:
-                agent_data["model"] = model
+            if part["model"]:
+                agent_data["model"] = part["model"]
 
-            # Update session token counts
+            # Credit this file's own totals to its session
             basename = os.path.basename(jf)
             sid = basename.replace(".jsonl", "").split("-topic-")[0]
-            for s in result["sessions"]:
-                if s["session_id"] == sid and s["agent_id"] == agent_id:
-                    s["tokens"] += agent_data["total_input"] + agent_data["total_output"]
+            for s in session_index.get((agent_id, sid), ()):
+                s["tokens"] += part["total_input"] + part["total_output"]
+                for k in SESSION_TOTALS + ("total_cost",):
+                    s[k] += part[k]
 
         agent_data["context_used"] = agent_data["total_input"] + agent_data["total_cache_read"]
         agent_data["channels"] = sorted(agent_data["channels"])
@@ -182,24 +242,153 @@ def aggregate():
     result["sessions"].sort(key=lambda x: x.get("updated_at", 0), reverse=True)
 
     # Cron
-    cron_files = glob.glob(os.path.join(CRON_DIR, "*.jsonl"))
-    for cf in cron_files:
+    result["cron_runs"] = recent_cron_runs(CRON_RECENT)
+    result["cron_jobs"] = _cron_jobs.refresh()
+
+    return result
+
+
+# --- Cron history ---
+# Run logs grow forever, so the newest runs are read from the end of the
+# files with a bounded heap, and the per-job totals are kept up to date by
+# reading only what was appended since the last refresh.
+CRON_RECENT = 20
+
+
+def _cron_record(line):
+    try:
+        rec = json.loads(line)
+    except Exception:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+def recent_cron_runs(n):
+    """The n newest cron runs by ts, ties in file and line order."""
+    files = []
+    for order, cf in enumerate(glob.glob(os.path.join(CRON_DIR, "*.jsonl"))):
         try:
-            with open(cf) as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        result["cron_runs"].append(json.loads(line))
-                    except Exception:
-                        pass
-        except Exception:
+            files.append((os.stat(cf).st_mtime, order, cf))
+        except OSError:
             pass
-    result["cron_runs"].sort(key=lambda x: x.get("ts", 0), reverse=True)
-    result["cron_runs"] = result["cron_runs"][:20]
+    files.sort(reverse=True)
+    heap = []  # (ts, -file order, lines from the end, run): the worst kept run on top
+    for mtime, order, cf in files:
+        # A file last written before the oldest kept run can't hold a newer one
+        if len(heap) == n and mtime * 1000 < heap[0][0]:
+            continue
+        try:
+            for back, line in enumerate(iter_reverse(cf)):
+                rec = _cron_record(line)
+                if rec is None:
+                    continue
+                entry = (rec.get("ts", 0), -order, back, rec)
+                if len(heap) < n:
+                    heapq.heappush(heap, entry)
+                elif entry[:3] > heap[0][:3]:
+                    heapq.heapreplace(heap, entry)
+                elif "ts" in rec and entry[0] < heap[0][0]:
+                    break  # runs are appended in time order
+        except OSError:
+            pass
+    return [entry[3] for entry in sorted(heap, key=lambda e: e[:3], reverse=True)]
 
-    return result
+
+class CronJobStats:
+    """Per-job run counts, failures and durations, updated from appended lines."""
+
+    def __init__(self):
+        self.files = {}  # path -> (inode, offset)
+        self.jobs = {}
+
+    def refresh(self):
+        paths = glob.glob(os.path.join(CRON_DIR, "*.jsonl"))
+        stats = {}
+        for cf in paths:
+            try:
+                stats[cf] = os.stat(cf)
+            except OSError:
+                pass
+        # Totals can't be taken back, so start over if a log went away or was rewritten
+        if any(cf not in stats or stats[cf].st_ino != ino or stats[cf].st_size < offset
+               for cf, (ino, offset) in self.files.items()):
+            self.files, self.jobs = {}, {}
+        for cf, st in stats.items():
+            ino, offset = self.files.get(cf, (st.st_ino, 0))
+            if st.st_size > offset:
+                offset = self._read(cf, offset)
+            self.files[cf] = (ino, offset)
+        return [self._summary(job_id, job) for job_id, job in sorted(self.jobs.items())]
+
+    def _read(self, cf, offset):
+        """Count the complete lines after `offset`; returns the new offset."""
+        try:
+            with open(cf, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+        except OSError:
+            return offset
+        end = chunk.rfind(b"\n") + 1
+        default_id = os.path.basename(cf)[:-len(".jsonl")]
+        for line in chunk[:end].splitlines():
+            rec = _cron_record(line) if line.strip() else None
+            if rec is None or rec.get("action", "finished") != "finished":
+                continue
+            job_id = rec.get("jobId") or default_id
+            job = self.jobs.setdefault(job_id, {
+                "runs": 0, "failures": 0, "total_duration_ms": 0, "max_duration_ms": 0,
+                "last_run": 0, "last_status": None,
+            })
+            job["runs"] += 1
+            if rec.get("status") == "error":
+                job["failures"] += 1
+            duration = rec.get("durationMs") or 0
+            job["total_duration_ms"] += duration
+            job["max_duration_ms"] = max(job["max_duration_ms"], duration)
+            if rec.get("ts", 0) >= job["last_run"]:
+                job["last_run"] = rec.get("ts", 0)
+                job["last_status"] = rec.get("status")
+        return offset + end
+
+    @staticmethod
+    def _summary(job_id, job):
+        return {
+            "job_id": job_id, "runs": job["runs"], "failures": job["failures"],
+            "avg_duration_ms": round(job["total_duration_ms"] / job["runs"]) if job["runs"] else 0,
+            "max_duration_ms": job["max_duration_ms"],
+            "last_run": job["last_run"], "last_status": job["last_status"],
+        }
+
+
+_cron_jobs = CronJobStats()
+
+
+# --- Background aggregation ---
+# aggregate() runs on its own thread every REFRESH_INTERVAL seconds and
+# /api/data serves the last completed result, so requests never wait on
+# transcript parsing (only the very first ones, until it has run once).
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", 5))
+_snapshot = None  # serialised /api/data payload of the last aggregate()
+_snapshot_ready = threading.Event()
+
+
+def refresh_snapshot():
+    global _snapshot
+    try:
+        _snapshot = json.dumps(aggregate(), separators=(",", ":")).encode()
+    except Exception as e:
+        print(f"aggregate() failed: {e!r}")
+    _snapshot_ready.set()
+
+
+def start_refresher():
+    def run():
+        while True:
+            started = time.monotonic()
+            refresh_snapshot()
+            time.sleep(max(REFRESH_INTERVAL - (time.monotonic() - started), 0))
+
+    threading.Thread(target=run, name="aggregate", daemon=True).start()
 
 
 # --- Auth ---
@@ -223,6 +412,126 @@ LOGIN_HTML = """<!DOCTYPE html>
 <button type="submit" class="w-full py-2 bg-green-500 hover:bg-green-600 text-white font-semibold rounded transition">Log In</button>
 </form></div></body></html>"""
 
+# --- Compression ---
+# JSON bodies over COMPRESS_MIN_SIZE bytes are sent gzip- or brotli-encoded
+# when the client accepts it. The last compressed body per encoding is kept,
+# so polls that see unchanged data don't compress it again.
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+_compressed = {}  # encoding -> (payload, compressed payload)
+
+
+def accepted_encoding(header: str, offered=None):
+    """Best of the `offered` encodings (br, gzip) allowed by an Accept-Encoding header, or None."""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in offered or (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(payload: bytes, encoding: str) -> bytes:
+    cached = _compressed.get(encoding)
+    if cached and cached[0] == payload:
+        return cached[1]
+    if encoding == "br":
+        body = brotli.compress(payload, quality=5)
+    else:
+        body = gzip.compress(payload, compresslevel=6, mtime=0)
+    _compressed[encoding] = (payload, body)
+    return body
+
+
+# --- Static assets ---
+# Dashboard pages, scripts, styles and images are kept in memory with a gzip
+# copy for the text ones; a stat() per request notices when a file is edited.
+# The cache holds at most ASSET_CACHE_SIZE bytes, dropping the least recently
+# used files first. Files over ASSET_MAX_FILE bytes and anything else under
+# the dashboard directory are read from disk on each request. HTML and
+# scripts are revalidated on every load (a cheap 304), images are cached.
+IMAGE_MAX_AGE = 7 * 24 * 3600
+ASSET_CACHE_SIZE = int(os.environ.get("ASSET_CACHE_SIZE", 8 * 1024 * 1024))
+ASSET_MAX_FILE = int(os.environ.get("ASSET_MAX_FILE", 512 * 1024))
+CACHED_TYPES = ("text/html", "text/css", "text/javascript", "application/javascript", "image/")
+
+
+class AssetCache:
+    def __init__(self, max_size=ASSET_CACHE_SIZE, max_file=ASSET_MAX_FILE):
+        self.entries = OrderedDict()  # path -> asset dict, least recently used first
+        self.size = 0
+        self.max_size = max_size
+        self.max_file = max_file
+        self.lock = threading.Lock()
+
+    def get(self, path, content_type):
+        """Validators and headers for a file; "body" is None if it isn't cached."""
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            asset = self.entries.get(path)
+            if asset is not None and asset["key"] == key:
+                self.entries.move_to_end(path)
+                return asset
+        asset = {
+            "key": key, "body": None, "gzip": None, "type": content_type,
+            "etag": "%x-%x" % key,
+            "mtime": int(st.st_mtime),
+            "cache_control": f"private, max-age={IMAGE_MAX_AGE}"
+            if content_type.startswith("image/") else "private, no-cache",
+        }
+        if st.st_size > self.max_file or not content_type.startswith(CACHED_TYPES):
+            return asset
+        with open(path, "rb") as f:
+            asset["body"] = f.read()
+        textual = content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml")
+        if textual and len(asset["body"]) >= COMPRESS_MIN_SIZE:
+            asset["gzip"] = gzip.compress(asset["body"], compresslevel=9, mtime=0)
+        asset["size"] = len(asset["body"]) + len(asset["gzip"] or b"")
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= old["size"]
+            self.entries[path] = asset
+            self.size += asset["size"]
+            while self.size > self.max_size:
+                _, old = self.entries.popitem(last=False)
+                self.size -= old["size"]
+        return asset
+
+
+ASSETS = AssetCache()
+
+
+# --- Sprint board ---
+# The handlers run on separate threads, so every read-modify-write of
+# sprint.json holds _sprint_lock. Writes go to a temp file that replaces the
+# original, so a reader never sees a truncated file.
+_sprint_lock = threading.Lock()
+
+
+def load_sprint():
+    try:
+        with open(SPRINT_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {"tasks": [], "next_id": 1}
+
+
+def save_sprint(sprint):
+    tmp = SPRINT_FILE.with_name(SPRINT_FILE.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(sprint, f, separators=(",", ":"))
+    os.replace(tmp, SPRINT_FILE)
+
+
 def check_auth(handler) -> bool:
     cookie_str = handler.headers.get("Cookie", "")
     cookie = SimpleCookie()
@@ -249,20 +558,17 @@ class Handler(SimpleHTTPRequestHandler):
             body = json.loads(self.rfile.read(length).decode())
             task_id = body.get("task_id")
             column = body.get("column")
-            try:
-                with open(SPRINT_FILE) as f:
-                    sprint = json.load(f)
-            except Exception:
-                sprint = {"tasks": [], "next_id": 1}
-            found = False
-            for t in sprint["tasks"]:
-                if t["id"] == task_id:
-                    t["column"] = column
-                    found = True
-                    break
+            with _sprint_lock:
+                sprint = load_sprint()
+                found = False
+                for t in sprint["tasks"]:
+                    if t["id"] == task_id:
+                        t["column"] = column
+                        found = True
+                        break
+                if found:
+                    save_sprint(sprint)
             if found:
-                with open(SPRINT_FILE, "w") as f:
-                    json.dump(sprint, f, indent=2)
                 self.send_response(200)
                 self.send_header("Content-Type", "application/json")
                 self.end_headers()
@@ -285,21 +591,17 @@ class Handler(SimpleHTTPRequestHandler):
                 return
             length = int(self.headers.get("Content-Length", 0))
             body = json.loads(self.rfile.read(length).decode())
-            try:
-                with open(SPRINT_FILE) as f:
-                    sprint = json.load(f)
-            except Exception:
-                sprint = {"tasks": [], "next_id": 1}
-            new_task = {
-                "id": sprint.get("next_id", len(sprint["tasks"]) + 1),
-                "title": body.get("title", "Untitled"),
-                "assignee": body.get("assignee", "Unassigned"),
-                "column": body.get("column", "backlog"),
-            }
-            sprint["tasks"].append(new_task)
-            sprint["next_id"] = new_task["id"] + 1
-            with open(SPRINT_FILE, "w") as f:
-                json.dump(sprint, f, indent=2)
+            with _sprint_lock:
+                sprint = load_sprint()
+                new_task = {
+                    "id": sprint.get("next_id", len(sprint["tasks"]) + 1),
+                    "title": body.get("title", "Untitled"),
+                    "assignee": body.get("assignee", "Unassigned"),
+                    "column": body.get("column", "backlog"),
+                }
+                sprint["tasks"].append(new_task)
+                sprint["next_id"] = new_task["id"] + 1
+                save_sprint(sprint)
             self.send_response(201)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
@@ -345,30 +647,98 @@ class Handler(SimpleHTTPRequestHandler):
             return
 
         if self.path.startswith("/api/sprint"):
-            try:
-                with open(SPRINT_FILE) as f:
-                    sprint = json.load(f)
-            except Exception:
-                sprint = {"tasks": [], "next_id": 1}
-            payload = json.dumps(sprint).encode()
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Length", len(payload))
-            self.end_headers()
-            self.wfile.write(payload)
+            with _sprint_lock:
+                sprint = load_sprint()
+            self.send_json(json.dumps(sprint, separators=(",", ":")).encode())
             return
 
         if self.path.startswith("/api/data"):
-            data = aggregate()
-            payload = json.dumps(data).encode()
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Length", len(payload))
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
-            self.wfile.write(payload)
+            _snapshot_ready.wait()
+            if _snapshot is None:
+                self.send_response(503)
+                self.send_header("Retry-After", str(int(REFRESH_INTERVAL) or 1))
+                self.end_headers()
+                return
+            self.send_json(_snapshot, {"Access-Control-Allow-Origin": "*"})
         else:
+            self.send_asset()
+
+    def send_asset(self):
+        """Serve a static file, from the asset cache if it's kept there, with validators and 304s."""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path):
+            # Directory redirects, listings and 404s as before
             super().do_GET()
+            return
+        try:
+            asset = ASSETS.get(path, self.guess_type(path))
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        encoding = None
+        if asset["gzip"] is not None and accepted_encoding(self.headers.get("Accept-Encoding", ""), ("gzip",)):
+            encoding = "gzip"
+        etag = f'"{asset["etag"]}-gzip"' if encoding else f'"{asset["etag"]}"'
+        fresh = self.not_modified(etag, asset["mtime"])
+        body = asset[encoding or "body"]
+        f = None
+        if fresh:
+            self.send_response(304)
+        else:
+            if body is None:
+                try:
+                    f = open(path, "rb")
+                except OSError:
+                    self.send_error(404, "File not found")
+                    return
+            self.send_response(200)
+            self.send_header("Content-Type", asset["type"])
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", os.fstat(f.fileno()).st_size if f else len(body))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(asset["mtime"], usegmt=True))
+        self.send_header("Cache-Control", asset["cache_control"])
+        if asset["gzip"] is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if f:
+            with f:
+                shutil.copyfileobj(f, self.wfile)
+        elif not fresh:
+            self.wfile.write(body)
+
+    def not_modified(self, etag, mtime):
+        """Whether the request's validators say the client's copy is current."""
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return mtime <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return False
+
+    def send_json(self, payload, headers=None):
+        """Send a 200 JSON response, compressed if it is large and the client allows."""
+        encoding = None
+        if len(payload) >= COMPRESS_MIN_SIZE:
+            encoding = accepted_encoding(self.headers.get("Accept-Encoding", ""))
+        body = compress(payload, encoding) if encoding else payload
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", len(body))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
 
     def log_message(self, fmt, *args):
         ts = datetime.datetime.now().strftime("%H:%M:%S")
@@ -377,7 +747,8 @@ class Handler(SimpleHTTPRequestHandler):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8787))
-    server = HTTPServer(("0.0.0.0", port), Handler)
+    start_refresher()
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
     print(f"🔮 Pied Piper Dashboard → http://localhost:{port}")
     try:
         server.serve_forever()
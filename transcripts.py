@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Fast-path decoding for OpenClaw JSONL transcripts (shared by app.py and serve.py)."""
+
+import json
+import re
+
+# Records are written as {"type":"...",...}, so the type can be read off the
+# raw bytes without decoding the (possibly huge) rest of the line.
+_TYPE_RE = re.compile(rb'\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+_MESSAGE_RE = re.compile(rb',\s*"message"\s*:\s*\{\s*"role"\s*:\s*"([^"\\]*)"')
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"\\]*)"')
+_CONTENT_RE = re.compile(rb'"content"\s*:\s*(?:(")|\[\s*\{\s*"type"\s*:\s*"text"\s*,\s*"text"\s*:\s*")')
+# Only assistant turns carry usage, model, provider and stopReason; tool
+# results and user turns are just content, so those can be cut short.
+_LIGHT_ROLES = (b"toolResult", b"user")
+
+# Lines longer than this are candidates for the oversized-content path.
+LARGE_RECORD = 32 * 1024
+# How much of the first text block to keep when skipping the rest.
+TEXT_PREFIX = 1024
+# How many escaped quotes to step over looking for the end of that block.
+ESCAPED_QUOTES = 2048
+
+
+def record_type(line):
+    """Return the top-level "type" of a raw record, or None if it can't be read cheaply."""
+    m = _TYPE_RE.match(line)
+    return m.group(1).decode() if m else None
+
+
+def decode(line, types):
+    """Decode a raw record only if its type is one of `types`.
+
+    Returns None for records of other types and for invalid JSON.
+    """
+    rtype = record_type(line)
+    if rtype is not None and rtype not in types:
+        return None
+    if rtype == "message" and len(line) > LARGE_RECORD:
+        rec = _decode_large_message(line)
+        if rec is not None:
+            return rec
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) and rec.get("type") in types else None
+
+
+def _string_prefix(line, start):
+    """Decode up to TEXT_PREFIX characters of the JSON string starting at `start`.
+
+    Returns (text, complete) or None if the bytes can't be decoded.
+    """
+    chunk = line[start:start + TEXT_PREFIX * 4]
+    end = chunk.find(b'"')
+    while end != -1:
+        backslashes = len(chunk[:end]) - len(chunk[:end].rstrip(b"\\"))
+        if backslashes % 2 == 0:
+            try:
+                return json.loads(b'"' + chunk[:end] + b'"')[:TEXT_PREFIX], True
+            except ValueError:
+                return None
+        end = chunk.find(b'"', end + 1)
+    raw = chunk.decode("utf-8", "ignore")
+    # Don't cut an escape sequence in half
+    cut = raw.rfind("\\", max(len(raw) - 6, 0))
+    if cut != -1:
+        backslashes = len(raw[:cut + 1]) - len(raw[:cut + 1].rstrip("\\"))
+        if backslashes % 2 == 1 and len(raw) - cut < (6 if raw[cut + 1:cut + 2] == "u" else 2):
+            raw = raw[:cut]
+    try:
+        return json.loads('"' + raw + '"')[:TEXT_PREFIX], False
+    except ValueError:
+        return None
+
+
+def _string_end(line, start):
+    """Index of the quote closing the JSON string that starts at `start`.
+
+    Returns -1 if there is none, or if more than ESCAPED_QUOTES escaped
+    quotes come first: stepping over those costs more than a full decode.
+    """
+    end = line.find(b'"', start)
+    for _ in range(ESCAPED_QUOTES + 1):
+        if end == -1:
+            break
+        i = end
+        while line[i - 1:i] == b"\\":
+            i -= 1
+        if (end - i) % 2 == 0:
+            return end
+        end = line.find(b'"', end + 1)
+    return -1
+
+
+def _decode_large_message(line):
+    """Decode an oversized tool-result or user message without its bulky content.
+
+    The returned record is the full record except that the first text block
+    of the content is cut to a prefix, which is all the dashboards show.
+    Returns None whenever the record doesn't have the expected layout, so
+    the caller falls back to a full decode.
+    """
+    m = _MESSAGE_RE.search(line)
+    if not m or m.group(1) not in _LIGHT_ROLES:
+        return None
+    c = _CONTENT_RE.search(line, m.end(), m.end() + 512)
+    if not c:
+        return None
+    end = _string_end(line, c.end())
+    if end == -1:
+        return None
+    prefix = _string_prefix(line, c.end())
+    if prefix is None:
+        return None
+    text, complete = prefix
+    if not text.strip() or (not complete and len(text.lstrip()) < 300):
+        return None
+    # Decode the line with that string emptied, so fields after it (and
+    # top-level keys after "message", such as id or parentId) are kept
+    try:
+        rec = json.loads(line[:c.end()] + line[end:])
+    except ValueError:
+        return None
+    if not isinstance(rec, dict) or "timestamp" not in rec or not isinstance(rec.get("message"), dict):
+        return None
+    content = rec["message"].get("content")
+    if c.group(1):
+        if content != "":
+            return None
+        rec["message"]["content"] = text
+    else:
+        if not isinstance(content, list) or not content or content[0].get("text") != "":
+            return None
+        content[0]["text"] = text
+    return rec
+
+
+def record_timestamp(line):
+    """Top-level "timestamp" of a raw record, or None if it has none."""
+    m = _TIMESTAMP_RE.search(line, 0, 1024)
+    if m:
+        return m.group(1).decode()
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    ts = rec.get("timestamp") if isinstance(rec, dict) else None
+    return ts if isinstance(ts, str) else None
+
+
+def seek_timestamp(path, ts, strict=True):
+    """Byte offset of the first line with a timestamp after `ts` (at or after, if not strict).
+
+    Relies on transcripts being appended in time order: the file is
+    binary-searched on line timestamps, then the last stretch is scanned.
+    Returns the file size if no such line exists.
+    """
+    def past(line_ts):
+        return line_ts > ts if strict else line_ts >= ts
+
+    with open(path, "rb") as f:
+        lo, hi = 0, f.seek(0, 2)
+        # Every timestamped line starting before lo is not past ts;
+        # the line starting at hi is past ts (or hi is EOF).
+        while hi - lo > 64 * 1024:
+            f.seek((lo + hi) // 2)
+            f.readline()
+            start = f.tell()
+            line_ts = None
+            while line_ts is None and start < hi:
+                line = f.readline()
+                line_ts = record_timestamp(line)
+                if line_ts is None:
+                    start = f.tell()
+            if line_ts is None:
+                break
+            if past(line_ts):
+                hi = start
+            else:
+                lo = start + len(line)
+        f.seek(lo)
+        pos = lo
+        while pos < hi:
+            line = f.readline()
+            line_ts = record_timestamp(line)
+            if line_ts is not None and past(line_ts):
+                return pos
+            pos += len(line)
+        return hi
+
+
+def iter_forward(path, start=0):
+    """Yield the non-blank lines of a file from byte offset `start` onwards."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def iter_reverse(path, end=None, block_size=64 * 1024):
+    """Yield the non-blank lines before byte offset `end` (default: EOF), last to first.
+
+    The file is read backwards in blocks, so only the tail that is actually
+    consumed gets read.
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, 2) if end is None else end
+        parts = []  # pieces of the line being assembled, last piece first
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            nl = block.rfind(b"\n")
+            if nl == -1:
+                parts.append(block)
+                continue
+            parts.append(block[nl + 1:])
+            line = b"".join(reversed(parts))
+            if line.strip():
+                yield line
+            segments = block[:nl].split(b"\n")
+            for seg in reversed(segments[1:]):
+                if seg.strip():
+                    yield seg
+            parts = [segments[0]]
+        line = b"".join(reversed(parts))
+        if line.strip():
+            yield line